@@ -0,0 +1,65 @@
+"""
+Benchmark et contrôle de précision de `BreakPointsDetection.detect_breakpoints` sur une série minute.
+
+Des ruptures de niveau sont placées à des positions qui ne tombent pas sur les frontières des blocs de la
+recherche grossière ; le script échoue (code de sortie 1) si une rupture détectée est à plus de --tolerance
+minutes de la vraie.
+
+Usage:
+    python src/benchmarks/bench_breakpoints.py --rows 2000000 --method binseg
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from packages.AnalyzerTS import BreakPointsDetection  # noqa: E402
+
+# positions relatives des ruptures, volontairement hors des multiples de la taille des blocs
+SHIFTS = [0.1502251, 0.4503049, 0.7501649]
+LEVELS = [2.0, -1.5, 2.0]
+
+
+def make_series(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.normal(0, 1, n_rows)
+    shifts = [int(position * n_rows) for position in SHIFTS]
+    for shift, level in zip(shifts, LEVELS):
+        y[shift:] += level
+    index = pd.date_range('2006-12-16 17:24:00', periods=n_rows, freq='T')
+    return pd.DataFrame({'y': y}, index=index), shifts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--method', default='binseg', choices=['binseg', 'window'])
+    parser.add_argument('--jump', type=int, default=5)
+    parser.add_argument('--tolerance', type=int, default=5, help='écart maximal toléré, en minutes')
+    args = parser.parse_args()
+
+    df, shifts = make_series(args.rows)
+    start = time.perf_counter()
+    found = BreakPointsDetection(df, 'y').detect_breakpoints(len(shifts), method=args.method, jump=args.jump)
+    elapsed = time.perf_counter() - start
+
+    # une rupture à la position s est renvoyée comme l'horodatage de la ligne s - 1
+    detected = [df.index.get_loc(timestamp) + 1 for timestamp in found]
+    errors = [abs(d - s) for d, s in zip(sorted(detected), shifts)]
+    print(f"rows: {args.rows:,}, méthode : {args.method}, temps : {elapsed:.3f}s")
+    print(f"ruptures vraies    : {shifts}")
+    print(f"ruptures détectées : {sorted(detected)}")
+    if len(detected) != len(shifts) or max(errors) > args.tolerance:
+        print(f"ÉCHEC : écart maximal de {max(errors)} minutes (tolérance {args.tolerance})")
+        return 1
+    print(f"écart maximal : {max(errors)} minutes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Benchmark de non-régression du temps d'import à froid des modules de traitement et de features.
+
+Chaque mesure lance un nouvel interpréteur avec `python -X importtime` et additionne le temps cumulé des
+imports de premier niveau. Le script échoue (code de sortie 1) si le meilleur des essais dépasse le budget,
+ou si une dépendance lourde (graphiques, statsmodels, profiling...) est chargée à l'import.
+
+Usage:
+    python src/benchmarks/bench_import_time.py --budget-ms 1000
+"""
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1]
+
+DEFAULT_MODULES = ["packages.Processing", "packages.FeatureEngineering"]
+
+# ne doivent être importées qu'à la première utilisation
+HEAVY_MODULES = ["matplotlib", "seaborn", "plotly", "statsmodels", "ruptures", "ydata_profiling", "holidays",
+                 "scipy.stats"]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(modules):
+    """
+    Importe `modules` dans un interpréteur neuf et renvoie (temps cumulé en µs, modules importés).
+    """
+    code = "import " + ", ".join(modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=SRC,
+                            capture_output=True, text=True, check=True)
+    total, imported = 0, set()
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match is None:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        imported.add(name)
+        # les imports de premier niveau contiennent déjà le temps de leurs dépendances
+        if len(indent) == 1:
+            total += cumulative
+    return total, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=1000.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # le premier essai sert aussi à remplir le cache disque ; on garde le meilleur temps
+    timings, imported = [], set()
+    for _ in range(args.repeat):
+        total, imported = measure(args.modules)
+        timings.append(total / 1000)
+    best = min(timings)
+    print(f"import {', '.join(args.modules)}: {best:.0f} ms (meilleur de {args.repeat}), budget {args.budget_ms:.0f} ms")
+
+    failed = False
+    heavy = sorted(name for name in HEAVY_MODULES if name in imported)
+    if heavy:
+        print(f"ÉCHEC : dépendances lourdes chargées à l'import : {', '.join(heavy)}")
+        failed = True
+    if best > args.budget_ms:
+        print(f"ÉCHEC : budget dépassé de {best - args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Benchmark des étapes critiques du pipeline sur données synthétiques, avec comparaison à une référence.
+
+Étapes mesurées : `DataProcessor.process_data`, `FeatureEngineer.create_variables`,
+`filter_correlated_variables` et `StationarityTest.get_stationary_variables`. Chaque étape tourne dans son
+propre sous-processus, pour que le pic de mémoire (RSS) mesuré soit le sien ; les données d'entrée sont
+préparées avant la mesure.
+
+Pour chaque étape sont relevés le temps d'exécution (meilleur de --repeat), le pic de RSS du processus,
+l'augmentation de ce pic due à l'étape et le débit en lignes par seconde. Les tests de stationnarité portent
+sur des séries sous-échantillonnées à --max-length points, sans quoi ils dominent tout le reste.
+
+Avec --baseline, le script échoue (code de sortie 1) si une étape est plus lente ou plus gourmande que la
+référence au-delà de la tolérance ; --save-baseline enregistre les mesures comme nouvelle référence.
+
+Usage:
+    python src/benchmarks/bench_pipeline.py --rows 500000 --save-baseline
+    python src/benchmarks/bench_pipeline.py --rows 500000 --baseline src/benchmarks/baseline.json
+"""
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from synthetic import NUMERIC_COLS, generate  # noqa: E402
+
+STAGES = ['process_data', 'create_variables', 'filter_correlated_variables', 'get_stationary_variables']
+TARGET = 'Global_active_power_Wh'
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+
+def _peak_rss_mb():
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS ; les pools de processus comptent aussi
+    scale = 1 if sys.platform == 'darwin' else 1024
+    peaks = [resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return max(peaks) * scale / 2 ** 20
+
+
+def _prepare(stage, n_rows, seed, max_length=None):
+    """
+    Prépare l'entrée d'une étape et renvoie la fonction à mesurer (sans argument).
+    """
+    from packages.Processing import DataProcessor
+
+    raw = generate(n_rows, seed=seed)
+    if stage == 'process_data':
+        return lambda: DataProcessor(raw.copy()).process_data(NUMERIC_COLS)
+
+    processed = DataProcessor(raw).process_data(NUMERIC_COLS)
+    numeric_cols = processed.select_dtypes(include='number').columns
+    numeric = processed[numeric_cols].astype('float32').ffill().bfill()
+    if stage == 'get_stationary_variables':
+        from packages.AnalyzerTS import StationarityTest
+
+        return lambda: StationarityTest(numeric).get_stationary_variables(max_length=max_length)
+
+    from packages.FeatureEngineering import FeatureEngineer
+
+    # 'Date' et 'Time' sont conservées : les étapes suivantes reçoivent le DataFrame tel que produit par le pipeline
+    filled = processed.assign(**numeric)
+
+    def create_variables():
+        return FeatureEngineer(filled.copy(), TARGET).create_variables([1, 2, 24], 'hour', [24])
+
+    if stage == 'create_variables':
+        return create_variables
+
+    from packages.FeatureSelection import filter_correlated_variables
+
+    features = create_variables()
+    return lambda: filter_correlated_variables(features, TARGET, plot=False)
+
+
+def run_stage(stage, n_rows, repeat, seed, max_length=None):
+    """
+    Mesure une étape dans le processus courant (appelé dans un sous-processus par `measure`).
+    """
+    func = _prepare(stage, n_rows, seed, max_length)
+    rss_before = _peak_rss_mb()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    wall = min(timings)
+    peak = _peak_rss_mb()
+    return {'wall_s': wall, 'peak_rss_mb': peak, 'rss_increase_mb': peak - rss_before,
+            'rows_per_s': n_rows / wall if wall > 0 else float('inf')}
+
+
+def measure(stage, n_rows, repeat, seed, max_length):
+    result = subprocess.run([sys.executable, __file__, '--worker', stage, '--rows', str(n_rows),
+                             '--repeat', str(repeat), '--seed', str(seed), '--max-length', str(max_length)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """
+    Liste des régressions par rapport à la référence.
+    """
+    regressions = []
+    for stage, result in results.items():
+        reference = baseline['stages'].get(stage)
+        if reference is None:
+            continue
+        if result['wall_s'] > reference['wall_s'] * (1 + time_tolerance):
+            regressions.append(f"{stage} : {result['wall_s']:.3f}s contre {reference['wall_s']:.3f}s")
+        if result['peak_rss_mb'] > reference['peak_rss_mb'] * (1 + memory_tolerance):
+            regressions.append(f"{stage} : {result['peak_rss_mb']:.0f} Mo contre {reference['peak_rss_mb']:.0f} Mo")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-length', type=int, default=20_000,
+                        help='longueur maximale des séries des tests de stationnarité (0 : séries complètes)')
+    parser.add_argument('--baseline', type=Path, default=None, help='référence à laquelle comparer les mesures')
+    parser.add_argument('--save-baseline', nargs='?', type=Path, const=DEFAULT_BASELINE, default=None,
+                        help=f'enregistre les mesures comme référence (par défaut {DEFAULT_BASELINE.name})')
+    parser.add_argument('--time-tolerance', type=float, default=0.25)
+    parser.add_argument('--memory-tolerance', type=float, default=0.10)
+    parser.add_argument('--worker', choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_stage(args.worker, args.rows, args.repeat, args.seed, args.max_length or None)))
+        return 0
+
+    results = {}
+    print(f"{'étape':<30}{'temps (s)':>12}{'pic RSS (Mo)':>15}{'hausse (Mo)':>14}{'lignes/s':>14}")
+    for stage in args.stages:
+        results[stage] = result = measure(stage, args.rows, args.repeat, args.seed, args.max_length)
+        print(f"{stage:<30}{result['wall_s']:>12.3f}{result['peak_rss_mb']:>15.0f}"
+              f"{result['rss_increase_mb']:>14.0f}{result['rows_per_s']:>14,.0f}")
+
+    if args.save_baseline is not None:
+        args.save_baseline.write_text(json.dumps({'rows': args.rows, 'max_length': args.max_length,
+                                                  'python': platform.python_version(),
+                                                  'machine': platform.machine(), 'stages': results}, indent=2))
+        print(f"référence enregistrée dans {args.save_baseline}")
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())
+        if (baseline['rows'], baseline.get('max_length')) != (args.rows, args.max_length):
+            print(f"ÉCHEC : la référence a été mesurée sur {baseline['rows']:,} lignes "
+                  f"(max_length={baseline.get('max_length')}), pas {args.rows:,} (max_length={args.max_length})")
+            return 1
+        regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}")
+        if regressions:
+            return 1
+        print("pas de régression par rapport à la référence")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Benchmark avant/après de l'analyse des colonnes 'Date' et 'Time' de DataProcessor.
+
+L'ancienne implémentation (concaténation 'Date + Time', second passage de 'Date' et strptime ligne par ligne
+sur 'Time') est reproduite ici pour comparaison avec `parse_timestamps`.
+
+Usage:
+    python src/benchmarks/bench_timestamp_parsing.py --rows 2000000
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from packages.Processing import parse_timestamps  # noqa: E402
+from synthetic import generate  # noqa: E402
+
+
+def make_raw_frame(n_rows):
+    return generate(n_rows)[['Date', 'Time']]
+
+
+def legacy_parse(df):
+    df = df.copy()
+    df['datetime'] = pd.to_datetime(df['Date'] + ' ' + df['Time'], format='%d/%m/%Y %H:%M:%S')
+    df = df.set_index('datetime')
+    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True)
+    df['Time'] = df['Time'].apply(lambda x: datetime.strptime(x, "%H:%M:%S").strftime("%H:%M:%S"))
+    return df
+
+
+def vectorized_parse(df):
+    index, dates, times = parse_timestamps(df['Date'], df['Time'])
+    df = df.set_axis(index, axis=0)
+    df['Date'] = dates
+    df['Time'] = times
+    return df
+
+
+def timeit(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_raw_frame(args.rows)
+    legacy_time, legacy = timeit(legacy_parse, df, args.repeat)
+    new_time, new = timeit(vectorized_parse, df, args.repeat)
+
+    assert legacy.index.equals(new.index)
+    assert np.array_equal(legacy['Date'].values, new['Date'].values)
+    assert (legacy['Time'] == new['Time']).all()
+
+    print(f"rows: {args.rows:,}")
+    print(f"avant (strptime par ligne) : {legacy_time:.3f}s")
+    print(f"après (parse_timestamps)   : {new_time:.3f}s")
+    print(f"accélération               : x{legacy_time / new_time:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Générateur de données synthétiques au format du jeu UCI « Individual household electric power consumption ».
+
+Les lignes reproduisent le fichier brut : colonnes 'Date' (d/m/yyyy, sans zéro initial) et 'Time' (hh:mm:ss)
+en chaînes, mesures numériques écrites en texte, et coupures de plusieurs minutes consécutives marquées par
+'?' sur toutes les mesures. La consommation suit un profil journalier, et les sous-compteurs restent
+inférieurs à l'énergie active totale.
+
+Usage:
+    python src/benchmarks/synthetic.py --rows 2000000 --output data/household_power_consumption.txt
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+NUMERIC_COLS = ['Global_active_power', 'Global_reactive_power', 'Voltage', 'Global_intensity',
+                'Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']
+
+START = pd.Timestamp('2006-12-16 17:24:00')
+
+
+def _format(values, decimals):
+    """
+    Écrit des valeurs en texte avec `decimals` décimales.
+
+    Les valeurs arrondies ne prennent que quelques milliers de valeurs distinctes : chacune est formatée
+    une seule fois, puis diffusée sur toutes les lignes.
+    """
+    codes = np.round(values * 10 ** decimals).astype(np.int64)
+    low = codes.min()
+    table = np.array([f"{(low + i) / 10 ** decimals:.{decimals}f}" for i in range(codes.max() - low + 1)],
+                     dtype=object)
+    return table[codes - low]
+
+
+def _outages(rng, n_rows, missing_rate, mean_length=60):
+    """
+    Masque des minutes manquantes, regroupées en coupures de longueur géométrique.
+    """
+    missing = np.zeros(n_rows, dtype=bool)
+    n_outages = rng.binomial(n_rows, missing_rate / mean_length) if missing_rate > 0 else 0
+    starts = rng.integers(0, n_rows, n_outages)
+    lengths = rng.geometric(1 / mean_length, n_outages)
+    for start, length in zip(starts, lengths):
+        missing[start:start + length] = True
+    return missing
+
+
+def generate(n_rows, seed=0, missing_rate=0.0125, start=START):
+    """
+    Génère `n_rows` minutes de données brutes, telles que lues par `pd.read_csv(..., dtype=str)`.
+
+    Args:
+        n_rows (int): Nombre de lignes (une par minute).
+        seed (int): Graine du générateur aléatoire.
+        missing_rate (float): Part approximative des minutes manquantes ('?').
+        start (pd.Timestamp): Première minute.
+
+    Returns:
+        pd.DataFrame: Colonnes 'Date', 'Time' et `NUMERIC_COLS`, toutes en chaînes de caractères.
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start)
+    minutes = np.arange(n_rows)
+
+    # 'Date' et 'Time' : une chaîne par jour et par minute de la journée, diffusées sur les lignes
+    minute_of_day = (start.hour * 60 + start.minute + minutes) % 1440
+    day = (start.hour * 60 + start.minute + minutes) // 1440
+    days = pd.date_range(start.normalize(), periods=day[-1] + 1, freq='D')
+    day_names = np.array([f"{d.day}/{d.month}/{d.year}" for d in days], dtype=object)
+    time_names = np.array([f"{m // 60:02d}:{m % 60:02d}:00" for m in range(1440)], dtype=object)
+
+    # profil journalier : creux la nuit, pics le matin et le soir
+    hour = minute_of_day / 60
+    profile = 0.6 + 0.5 * np.exp(-((hour - 8) / 1.5) ** 2) + 0.9 * np.exp(-((hour - 20) / 2) ** 2)
+    active = np.clip(profile * rng.gamma(2.0, 0.5, n_rows), 0.076, 11.0)
+    voltage = np.clip(rng.normal(240.8, 3.2, n_rows), 223.2, 254.2)
+    energy = active * 1000 / 60
+
+    # les sous-compteurs (Wh) se partagent au plus l'énergie active totale
+    shares = rng.dirichlet([0.3, 0.4, 1.2, 1.5], n_rows)
+    sub_meterings = np.floor(shares[:, :3] * energy[:, None])
+
+    values = {
+        'Global_active_power': _format(active, 3),
+        'Global_reactive_power': _format(np.clip(rng.gamma(1.5, 0.08, n_rows), 0, 1.39), 3),
+        'Voltage': _format(voltage, 2),
+        'Global_intensity': _format(np.round(active * 1000 / voltage, 1), 1),
+        'Sub_metering_1': _format(sub_meterings[:, 0], 3),
+        'Sub_metering_2': _format(sub_meterings[:, 1], 3),
+        'Sub_metering_3': _format(sub_meterings[:, 2], 1),
+    }
+    missing = _outages(rng, n_rows, missing_rate)
+    for column in values.values():
+        column[missing] = '?'
+
+    df = pd.DataFrame({'Date': day_names[day], 'Time': time_names[minute_of_day], **values})
+    return df
+
+
+def iter_chunks(n_rows, chunk_rows=1_000_000, seed=0, missing_rate=0.0125, start=START):
+    """
+    Génère les données par morceaux consécutifs de `chunk_rows` lignes, pour les tailles qui ne tiennent pas
+    en mémoire une fois en chaînes de caractères.
+    """
+    for i, offset in enumerate(range(0, n_rows, chunk_rows)):
+        yield generate(min(chunk_rows, n_rows - offset), seed=(seed, i), missing_rate=missing_rate,
+                       start=pd.Timestamp(start) + pd.Timedelta(minutes=offset))
+
+
+def write(path, n_rows, chunk_rows=1_000_000, seed=0, missing_rate=0.0125):
+    """
+    Écrit un fichier brut de `n_rows` lignes, séparé par ';' comme le fichier UCI.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        for i, chunk in enumerate(iter_chunks(n_rows, chunk_rows, seed, missing_rate)):
+            chunk.to_csv(f, sep=';', index=False, header=i == 0)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_049_280)
+    parser.add_argument('--output', default='data/household_power_consumption.txt')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--missing-rate', type=float, default=0.0125)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    path = write(args.output, args.rows, args.chunk_rows, args.seed, args.missing_rate)
+    print(f"{args.rows:,} lignes écrites dans {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,57 @@
-import plotly.graph_objs as go
-import plotly.express as px
-import statsmodels.graphics.tsaplots as tsaplots
-import matplotlib.pyplot as plt
-import statsmodels.api as sm
 import numpy as np
 import pandas as pd
-import ruptures as rpt
-import seaborn as sns
+from scipy.fft import irfft, next_fast_len, rfft
+
+from .Parallel import map_tasks
+from .Rendering import line_figure, plot_line
+
+
+def acf_fft(values, nlags):
+    """
+    Autocorrelations of every column of a 2-D array, up to `nlags`, computed at once by FFT.
+
+    Same estimator as `statsmodels.tsa.stattools.acf` (demeaned, not adjusted): O(n log n) per
+    column whatever the number of lags.
+
+    Args:
+        values (np.ndarray): Array of shape (n, k), one series per column.
+        nlags (int): Largest lag.
+
+    Returns:
+        np.ndarray: Array of shape (nlags + 1, k).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    centered = values - values.mean(axis=0)
+    size = next_fast_len(2 * len(values) - 1)
+    spectrum = rfft(centered, size, axis=0)
+    autocovariance = irfft(spectrum * np.conj(spectrum), size, axis=0)[:nlags + 1]
+    return autocovariance / autocovariance[0]
+
+
+def pacf_durbin_levinson(acf):
+    """
+    Partial autocorrelations derived from autocorrelations by the Durbin-Levinson recursion.
+
+    Equivalent to `statsmodels.tsa.stattools.pacf(method="ywm")`, vectorized over the columns.
+
+    Args:
+        acf (np.ndarray): Array of shape (nlags + 1, k) returned by `acf_fft`.
+
+    Returns:
+        np.ndarray: Array of shape (nlags + 1, k).
+    """
+    nlags = len(acf) - 1
+    pacf = np.ones_like(acf)
+    # phi[j] holds the coefficients of the AR(m) fit at lag j, for every column
+    phi = np.zeros_like(acf)
+    variance = np.ones(acf.shape[1:])
+    for m in range(1, nlags + 1):
+        reflection = (acf[m] - np.einsum('j...,j...->...', phi[1:m], acf[m - 1:0:-1])) / variance
+        phi[1:m] = phi[1:m] - reflection * phi[m - 1:0:-1]
+        phi[m] = reflection
+        variance = variance * (1 - reflection ** 2)
+        pacf[m] = reflection
+    return pacf
 
 
 class StationnaryViz:
@@ -15,74 +60,160 @@ class StationnaryViz:
         self.df = df
         self.target = target
         self.colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
+        self._correlograms = {}
+
+    def correlogram(self, cols, nlags=20):
+        """
+        ACF et PACF des séries, calculées ensemble par FFT puis mises en cache.
+
+        Les séries absentes du cache (ou calculées avec moins de lags) sont calculées en un seul lot ;
+        les graphiques et les tableaux réutilisent ces mêmes résultats.
 
-    def plot_acf_pacf(self, cols):
+        Args:
+            cols (list): Liste des noms des colonnes.
+            nlags (int): Nombre de lags (ex. 1440 pour la saisonnalité journalière des données minute).
+
+        Returns:
+            pd.DataFrame: Une ligne par lag, colonnes (série, 'acf' / 'pacf').
+        """
+        missing = [col for col in cols
+                   if col not in self._correlograms or len(self._correlograms[col][0]) <= nlags]
+        if missing:
+            acf = acf_fft(self.df[missing].to_numpy(dtype=np.float64), nlags)
+            pacf = pacf_durbin_levinson(acf)
+            for i, col in enumerate(missing):
+                self._correlograms[col] = (acf[:, i], pacf[:, i])
+        return pd.concat({col: pd.DataFrame({'acf': self._correlograms[col][0][:nlags + 1],
+                                             'pacf': self._correlograms[col][1][:nlags + 1]})
+                          for col in cols}, axis=1).rename_axis('lag')
+
+    def _plot_correlogram(self, col, kind, nlags, ax, alpha=0.05):
+        """
+        Trace l'ACF ou la PACF en cache d'une série, avec son intervalle de confiance
+        (formule de Bartlett pour l'ACF, 1/n pour la PACF, comme statsmodels).
+        """
+        from scipy.stats import norm
+
+        values = self.correlogram([col], nlags)[(col, kind)].to_numpy()
+        n_obs = len(self.df)
+        if kind == 'acf':
+            # Bartlett : var(r_k) = (1 + 2 * sum_{j=1}^{k-1} r_j^2) / n, sans r_0
+            variance = np.full(nlags + 1, 1 / n_obs)
+            variance[0] = 0.0
+            variance[2:] *= 1 + 2 * np.cumsum(values[1:-1] ** 2)
+        else:
+            variance = np.concatenate([[0.0], np.full(nlags, 1 / n_obs)])
+        band = norm.ppf(1 - alpha / 2) * np.sqrt(variance)
+        lags = np.arange(nlags + 1)
+        ax.vlines(lags, 0, values, color=self.colors[0])
+        ax.plot(lags, values, 'o', color=self.colors[0], markersize=3 if nlags > 50 else 5)
+        ax.fill_between(lags, -band, band, alpha=0.25, linewidth=0)
+        ax.axhline(0, color='black', linewidth=0.8)
+
+    def plot_acf_pacf(self, cols, lags=10):
         """
         Graphique des ACF et PACF des différentes séries.
 
         Args:
             cols (list): Liste des noms des colonnes à utiliser pour l'ACF and PACF .
+            lags (int): Nombre de lags affichés.
 
         Returns:
             ACF et PACF des séries
         """
+        import matplotlib.pyplot as plt
+
+        self.correlogram(cols, lags)
         for col in cols:
             print(f"ACF and PACF of the series {col}:")
-            ts = self.df[col]
             fig, axs = plt.subplots(2, sharex=True, figsize=(10, 6))
-            tsaplots.plot_acf(ts, lags=10, ax=axs[0])
+            self._plot_correlogram(col, 'acf', lags, axs[0])
             axs[0].set_title(f"ACF of {col}")
-            tsaplots.plot_pacf(ts, lags=10, ax=axs[1])
+            self._plot_correlogram(col, 'pacf', lags, axs[1])
             axs[1].set_title(f"PACF of {col}")
             plt.show()
 
 
-    def plot_target(self):
+    def plot_target(self, n_points=2000, method="minmax"):
         """
         Plot the evolution of the default rate using the DataFrame provided during class initialization.
 
         Args : 
             self : DataFrame containing the default rate time series
+            n_points : nombre maximal de points affichés (la série est sous-échantillonnée en conservant
+                sa forme, puis rechargée plus finement lors d'un zoom)
+            method : méthode de sous-échantillonnage, 'minmax' ou 'lttb'
 
         Returns :
             A plot of the default rate evolution.
         """
-        fig = px.line(self.df, x=self.df.index, y=self.target)
-        fig.update_layout(title_text='Target time serie')
+        fig = line_figure(self.df[self.target], n_points, method, title='Target time serie')
         fig.show()
 
-    def plot_autocorrelation_target(self):
+    def plot_autocorrelation_target(self, lags=20):
         """ 
             Autocorrélation de la target
             
          Args : 
              self : DataFrame contenant la série de la target
+             lags : nombre de lags affichés
              
           Returns : 
               ACF de la target """
-        fig = tsaplots.plot_acf(self.df[self.target], lags=20)
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots()
+        self._plot_correlogram(self.target, 'acf', lags, ax)
+        ax.set_title('Autocorrelation')
 
         plt.xlabel("Lag at k")
         plt.ylabel("Correlation coefficient")
         plt.show()
 
-    def plot_partial_autocorrelation_target(self):
+    def plot_partial_autocorrelation_target(self, lags=20):
         """ 
         Autocorrélation partielle de la target
         
         Args : 
             self : DataFrame contenant la série de la target
+            lags : nombre de lags affichés
             
         Returns : 
             PACF de la target
                         """
-        fig = tsaplots.plot_pacf(self.df[self.target], lags=20)
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots()
+        self._plot_correlogram(self.target, 'pacf', lags, ax)
+        ax.set_title('Partial Autocorrelation')
 
         plt.xlabel("Lag at k")
         plt.ylabel("Correlation coefficient")
         plt.show()
 
 
+def _run_stationarity_tests(column, tests, values):
+    """
+    Runs every stationarity test of `tests` on one series, so that the series is sent to a worker
+    process once whatever the number of tests.
+    """
+    import statsmodels.api as sm
+
+    results = []
+    for test in tests:
+        if test == "kpss":
+            statistic, p_value, lags, critical_values = sm.tsa.stattools.kpss(values)
+        elif test in ("adf", "pp"):
+            # comme pp_test, le test "Phillips-Perron" est un ADF avec constante et tendance
+            regression = "ct" if test == "pp" else "c"
+            statistic, p_value, lags, _, critical_values, _ = sm.tsa.stattools.adfuller(values, regression=regression)
+        else:
+            raise ValueError("Invalid test. Please use 'adf', 'kpss' or 'pp'.")
+        results.append({"column": column, "test": test, "statistic": statistic, "p_value": p_value,
+                        "lags": lags, "critical_values": critical_values})
+    return results
+
+
 class StationarityTest:
 
     def __init__(self, data):
@@ -98,6 +229,8 @@ class StationarityTest:
          
          Returns : 
              résultat du test de stationnarité : série stationnaire ou non-stationnaire """
+        import statsmodels.api as sm
+
         for col in columns:
             result = sm.tsa.stattools.adfuller(self.data[col])
             print(f'ADF test pour {col}:')
@@ -122,6 +255,8 @@ class StationarityTest:
          
          Returns : 
              résultat du test de stationnarité : série stationnaire ou non-stationnaire """
+        import statsmodels.api as sm
+
         for col in columns:
             result = sm.tsa.stattools.kpss(self.data[col])
             print(f'KPSS test pour {col}:')
@@ -146,6 +281,8 @@ class StationarityTest:
          
         Returns : 
             Résultat du test de stationnarité : série stationnaire ou non-stationnaire """
+        import statsmodels.api as sm
+
         for col in columns:
             result = sm.tsa.stattools.adfuller(self.data[col], regression='ct')
             print(f'Phillips-Perron test pour {col}:')
@@ -160,20 +297,42 @@ class StationarityTest:
                     "stationnaire.")
             print('')
     
-    def get_stationary_variables(self):
-        results = {}
+    def run_tests(self, columns=None, tests=("adf", "kpss", "pp"), alpha=0.05, max_length=None, n_jobs=None):
+        """
+        Runs every test on every column, spread over a pool of processes.
 
-        for col in self.data.columns:
-            adf_test = sm.tsa.stattools.adfuller(self.data[col])
-            kpss_test = sm.tsa.stattools.kpss(self.data[col])
-            pptest = sm.tsa.stattools.adfuller(self.data[col], regression='ct')
+        Args :
+            columns : séries du DataFrame à tester (toutes par défaut)
+            tests : tests à effectuer parmi 'adf', 'kpss' et 'pp'
+            alpha : seuil de rejet de l'hypothèse nulle
+            max_length : si renseigné, les séries plus longues sont sous-échantillonnées à pas régulier
+                pour ne pas dépasser cette longueur
+            n_jobs : nombre de processus (1 pour tout exécuter dans le processus courant)
 
-            if adf_test[1] < 0.05 or kpss_test[1] < 0.05 or pptest[1] < 0.05:
-                results[col] = True
-            else:
-                results[col] = False
+        Returns :
+            DataFrame avec une ligne par (série, test) : statistique, p-value, lags, valeurs critiques,
+            rejet de l'hypothèse nulle et conclusion (pour le KPSS, l'hypothèse nulle est la stationnarité)
+        """
+        columns = self.data.columns if columns is None else columns
+        tasks = []
+        for col in columns:
+            values = self.data[col].to_numpy(dtype=np.float64)
+            if max_length is not None and len(values) > max_length:
+                values = values[::-(-len(values) // max_length)]
+            tasks.append((col, tuple(tests), values))
+
+        results = [result for column_results in map_tasks(_run_stationarity_tests, tasks, n_jobs)
+                   for result in column_results]
 
-        return results
+        table = pd.DataFrame(results, columns=["column", "test", "statistic", "p_value", "lags", "critical_values"])
+        table["reject_h0"] = table["p_value"] < alpha
+        table["stationary"] = np.where(table["test"] == "kpss", ~table["reject_h0"], table["reject_h0"])
+        return table
+
+    def get_stationary_variables(self, max_length=None, n_jobs=None):
+        table = self.run_tests(max_length=max_length, n_jobs=n_jobs)
+        rejected = table.groupby("column")["reject_h0"].any()
+        return {col: bool(rejected[col]) for col in self.data.columns}
 
 
 
@@ -193,27 +352,80 @@ class BreakPointsDetection:
         self.df = df
         self.target = target
     
-    def detect_breakpoints_and_visualize(self, n_breaks: int = 6) -> None:
+    def detect_breakpoints(self, n_bkps: int = 5, method: str = "binseg", model: str = "l1",
+                           penalty: float = None, max_points: int = 10_000, refine: bool = True,
+                           jump: int = 5) -> pd.DatetimeIndex:
+        """
+        Detect breakpoints in the target variable, without plotting.
+
+        Long series are first averaged into at most `max_points` blocks, so that the search runs on a
+        short signal; each breakpoint found on the blocks is then refined back to the original
+        resolution by searching the best single split around it.
+
+        :param n_bkps: The number of breakpoints to detect (ignored when a penalty is used).
+        :param method: "binseg", "pelt", "window" or "dynp". PELT, binary segmentation and window
+            search are linear or near-linear; dynamic programming is quadratic and only meant for
+            short (downsampled) signals.
+        :param model: The ruptures cost model ("l1", "l2", "rbf", ...).
+        :param penalty: Penalty value, required by "pelt"; if set, it replaces `n_bkps` for "binseg"
+            and "window". "dynp" only takes `n_bkps`.
+        :param max_points: Maximum length of the signal given to the search.
+        :param refine: Whether to refine the breakpoints back to the original resolution.
+        :param jump: Grid of the search on the blocks: breakpoints are only considered every `jump`
+            blocks, so the refinement searches `jump` blocks on each side of them. 1 searches every
+            block, at a higher cost for "pelt" and "dynp".
+        :return: The timestamps of the last point before each breakpoint.
+        """
+        import ruptures as rpt
+
+        y = self.df[self.target].to_numpy()
+        if np.isnan(y).any():
+            raise ValueError(f"{self.target} contains missing values, fill or drop them first.")
+
+        factor = max(1, -(-len(y) // max_points))
+        starts = np.arange(0, len(y), factor)
+        signal = np.add.reduceat(y, starts) / np.diff(np.append(starts, len(y))) if factor > 1 else y
+
+        searches = {"binseg": rpt.Binseg, "pelt": rpt.Pelt, "window": rpt.Window, "dynp": rpt.Dynp}
+        if method not in searches:
+            raise ValueError("Invalid method. Please use 'binseg', 'pelt', 'window' or 'dynp'.")
+        if method == "pelt" and penalty is None:
+            raise ValueError("The 'pelt' method needs a penalty.")
+        if method == "dynp" and penalty is not None:
+            raise ValueError("The 'dynp' method takes n_bkps, not a penalty.")
+        search = searches[method](model=model, jump=jump).fit(signal)
+        bkps = search.predict(pen=penalty) if penalty is not None else search.predict(n_bkps=n_bkps)
+        # ruptures returns the end of the signal as the last breakpoint
+        bkps = [b * factor for b in bkps[:-1]]
+
+        if refine and factor > 1:
+            refined = []
+            # the true change lies within `jump` blocks of the breakpoint found on the grid
+            reach = factor * jump
+            for b in bkps:
+                low, high = max(b - reach, 0), min(b + reach, len(y))
+                local = rpt.Binseg(model=model, min_size=1, jump=1).fit(y[low:high])
+                refined.append(low + local.predict(n_bkps=1)[0])
+            bkps = refined
+
+        return self.df.index[np.asarray(bkps, dtype=int) - 1]
+
+    def detect_breakpoints_and_visualize(self, n_breaks: int = 6, **kwargs) -> None:
         """
         Detect breakpoints in the target variable and plot the data with the detected breakpoints.
 
         :param n_breaks: The number of breaks to be detected. Defaults to 6.
+        :param kwargs: Passed to `detect_breakpoints` (method, model, penalty, max_points, refine, jump).
         """
 
-        # Detect breakpoints using ruptures library
-        y = np.array(self.df[self.target].tolist())
-        model = rpt.Dynp(model="l1")
-        model.fit(y)
-        breaks = model.predict(n_bkps=n_breaks-1)
+        import matplotlib.pyplot as plt
 
-        breaks_rpt = []
+        # Detect breakpoints using ruptures library
         ts = self.df[self.target]
-        for i in breaks:
-            breaks_rpt.append(ts.index[i-1])
-        breaks_rpt = pd.to_datetime(breaks_rpt)
+        breaks_rpt = self.detect_breakpoints(n_bkps=n_breaks-1, **kwargs).append(ts.index[-1:])
 
         # Plot data with detected breakpoints
-        plt.plot(ts, label='data')
+        plot_line(ts, label='data')
         plt.title('Default rate')
         print_legend = True
         for i in breaks_rpt:
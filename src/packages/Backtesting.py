@@ -0,0 +1,224 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from .Datasets import WindowDataset, to_convlstm
+from .FeatureEngineering import ROLLING_STATISTICS, FeatureEngineer
+from .Parallel import map_tasks
+
+# feature matrix and target shared with the worker processes, set by `_share`
+_SHARED = {}
+
+
+def _share(X, y):
+    _SHARED["X"], _SHARED["y"] = X, y
+
+
+def walk_forward_folds(n_rows, n_folds=5, test_size=None, train_size=None, gap=0):
+    """
+    Row ranges of walk-forward folds: consecutive test blocks ending with the series, each trained on the
+    rows before it.
+
+    Args:
+        n_rows (int): Length of the series.
+        n_folds (int): Number of folds.
+        test_size (int): Rows per test block (by default, the last half of the series split in `n_folds`).
+        train_size (int): Rows of the rolling training window; None trains on everything before the test
+            block (expanding window).
+        gap (int): Rows left out between the training and the test rows, e.g. the forecast horizon.
+
+    Returns:
+        list: (train_start, train_end, test_start, test_end) tuples, ends excluded.
+    """
+    test_size = n_rows // (2 * n_folds) if test_size is None else test_size
+    if test_size < 1:
+        raise ValueError("Not enough rows before the first test block, use fewer or smaller folds.")
+    folds = []
+    for test_start in range(n_rows - n_folds * test_size, n_rows, test_size):
+        train_end = test_start - gap
+        train_start = 0 if train_size is None else max(train_end - train_size, 0)
+        if train_end <= train_start:
+            raise ValueError("Not enough rows before the first test block, use fewer or smaller folds.")
+        folds.append((train_start, train_end, test_start, test_start + test_size))
+    return folds
+
+
+def _run_fold(fold, bounds, model_factory):
+    """
+    Trains and scores one fold on the shared arrays. The training and test sets are views, not copies.
+    """
+    X, y = _SHARED["X"], _SHARED["y"]
+    train_start, train_end, test_start, test_end = bounds
+
+    started = time.perf_counter()
+    model = model_factory()
+    model.fit(X[train_start:train_end], y[train_start:train_end])
+    fitted = time.perf_counter()
+    context = getattr(model, "context_rows", None)
+    if context is None:
+        predictions = model.predict(X[test_start:test_end])
+    else:
+        # sequence models see the rows before the test block, and the observed target up to each row
+        history = max(test_start - context, 0)
+        predictions = model.predict(X[history:test_end], y[history:test_end])[test_start - history:]
+    predictions = np.asarray(predictions, dtype=np.float64).ravel()
+    predicted = time.perf_counter()
+
+    errors = predictions - y[test_start:test_end]
+    return {"fold": fold, "mae": np.abs(errors).mean(), "rmse": np.sqrt((errors ** 2).mean()),
+            "fit_s": fitted - started, "predict_s": predicted - fitted}
+
+
+def _is_target_statistic(column, target):
+    prefix, _, window = column.rpartition("_")
+    return window.isdigit() and prefix in {f"{target}_{statistic}" for statistic in ROLLING_STATISTICS}
+
+
+class ConvLSTMForecaster:
+    """
+    Adapts a Keras ConvLSTM to the sequence model interface of `WalkForwardBacktester`.
+
+    Each row is predicted from the `window` rows before it: the observed target and, optionally, the
+    feature matrix columns at the `columns` indices. The windows of a fold are built by a `Datasets.WindowDataset` and
+    trained on in shuffled mini-batches, so that only one batch is materialized at a time.
+
+    Use `functools.partial(ConvLSTMForecaster, build_model, ...)` as model factory, with `build_model` a
+    module-level function returning a compiled model of input shape (None, n_subsequences, 1,
+    window // n_subsequences, len(columns) + 1). TensorFlow does not survive a fork once initialized:
+    run with n_jobs=1, or without importing it in the parent process.
+
+    Attributes:
+        context_rows (int): Rows needed before the first prediction (read by the backtester).
+    """
+
+    def __init__(self, build_model, window=12, n_subsequences=1, columns=(), epochs=1, batch_size=256, seed=None):
+        if window % n_subsequences:
+            raise ValueError(f"The window ({window}) is not a multiple of n_subsequences ({n_subsequences}).")
+        self.build_model = build_model
+        self.window = window
+        self.n_subsequences = n_subsequences
+        self.columns = list(columns)
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.seed = seed
+        self.context_rows = window
+        self.model = None
+
+    def _dataset(self, X, y):
+        # target last, so that the windows of a univariate model are just the target history
+        frame = pd.DataFrame(np.column_stack([X[:, self.columns], y]))
+        return WindowDataset(frame, frame.columns[-1], window=self.window)
+
+    def fit(self, X, y):
+        dataset = self._dataset(X, y)
+        self.model = self.build_model()
+        for epoch in range(self.epochs):
+            seed = None if self.seed is None else self.seed + epoch
+            for windows, targets in dataset.batches(self.batch_size, seed=seed, n_subsequences=self.n_subsequences):
+                self.model.train_on_batch(windows, targets)
+        return self
+
+    def predict(self, X, y):
+        """
+        Prediction of every row from the `window` rows before it (NaN for the first `window` rows).
+        """
+        dataset = self._dataset(X, y)
+        predictions = np.full(len(X), np.nan)
+        # one window per row with a full history, whatever its target
+        starts = np.arange(len(X) - self.window)
+        for begin in range(0, len(starts), self.batch_size):
+            batch = starts[begin:begin + self.batch_size]
+            windows = to_convlstm(dataset.values[batch[:, None] + np.arange(self.window)], self.n_subsequences)
+            outputs = np.asarray(self.model.predict(windows, verbose=0))
+            predictions[batch + self.window] = outputs.reshape(len(batch), -1)[:, 0]
+        return predictions
+
+
+class WalkForwardBacktester:
+    """
+    Walk-forward evaluation of forecasting models on a feature frame computed once.
+
+    The features and the target are stored once as contiguous float32 arrays; every fold only holds
+    row ranges into them. Folds are trained in a pool of processes which, where the platform forks,
+    inherit the arrays without copying or pickling them.
+
+    The rolling statistics of the target from `create_variables` cover windows ending on their own row,
+    which contain the value to predict: they are shifted by `gap + 1` rows, so that each row only sees
+    windows ending before the forecast is made, and the first `gap + 1` rows are left out.
+
+    Attributes:
+        target (str): Column to predict.
+        features (list): Columns given to the models (the numeric columns other than the target by default).
+        index (pd.Index): Timestamps of the rows.
+        folds (list): (train_start, train_end, test_start, test_end) row ranges.
+    """
+
+    def __init__(self, df, target, features=None, n_folds=5, test_size=None, train_size=None, gap=0):
+        self.target = target
+        if features is None:
+            features = df.drop(columns=target).select_dtypes(include="number").columns
+        self.features = list(features)
+        X = df[self.features].to_numpy(dtype=np.float32)
+        y = df[target].to_numpy(dtype=np.float32)
+        statistics = [k for k, col in enumerate(self.features) if _is_target_statistic(col, target)]
+        start = gap + 1 if statistics else 0
+        if statistics:
+            X[start:, statistics] = X[:len(X) - start, statistics]
+        self.index = df.index[start:]
+        self.X = np.ascontiguousarray(X[start:])
+        self.y = y[start:]
+        self.folds = walk_forward_folds(len(self.y), n_folds, test_size, train_size, gap)
+
+    @classmethod
+    def from_processed(cls, df, target, lag, time, window_size, lag_columns=None, **kwargs):
+        """
+        Builds the features of the whole timeline once with `FeatureEngineer.create_variables`, then
+        the backtester on them.
+        """
+        features = FeatureEngineer(df, target).create_variables(lag, time, window_size, lag_columns)
+        return cls(features, target, **kwargs)
+
+    def run(self, model_factory, n_jobs=None):
+        """
+        Trains and scores a new model on every fold.
+
+        Args:
+            model_factory: Picklable callable returning an unfitted model with `fit(X, y)` and
+                `predict(X)` (a model class, a module-level function, a functools.partial...). A sequence
+                model with a `context_rows` attribute, such as `ConvLSTMForecaster`, is given
+                `predict(X, y)` on the test block preceded by `context_rows` rows, and returns one
+                prediction per row; it must only use the rows before each one.
+            n_jobs (int): Number of processes (1 to run every fold in the current process).
+
+        Returns:
+            pd.DataFrame: One row per fold with its periods, sizes, MAE, RMSE and fit/predict times; the
+                wall time of the whole run is in `attrs['wall_s']`.
+        """
+        started = time.perf_counter()
+        tasks = [(fold, bounds, model_factory) for fold, bounds in enumerate(self.folds)]
+        try:
+            results = map_tasks(_run_fold, tasks, n_jobs, initializer=_share, initargs=(self.X, self.y))
+        finally:
+            _SHARED.clear()
+
+        table = pd.DataFrame(results)
+        bounds = np.array(self.folds)
+        table.insert(1, "train_start", self.index[bounds[:, 0]])
+        table.insert(2, "train_end", self.index[bounds[:, 1] - 1])
+        table.insert(3, "test_start", self.index[bounds[:, 2]])
+        table.insert(4, "test_end", self.index[bounds[:, 3] - 1])
+        table.insert(5, "n_train", bounds[:, 1] - bounds[:, 0])
+        table.insert(6, "n_test", bounds[:, 3] - bounds[:, 2])
+        table.attrs["wall_s"] = time.perf_counter() - started
+        return table
+
+    def compare(self, model_factories, n_jobs=None):
+        """
+        Runs every model of a {name: model_factory} dict on the same folds.
+
+        Returns:
+            pd.DataFrame: The per-fold results of every model, with a 'model' column.
+        """
+        return pd.concat({name: self.run(factory, n_jobs) for name, factory in model_factories.items()},
+                         names=["model"]).reset_index(level=0).reset_index(drop=True)
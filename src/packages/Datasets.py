@@ -0,0 +1,125 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def to_convlstm(windows, n_subsequences=1):
+    """
+    Reshapes (samples, window, features) windows into the (samples, subsequences, 1, steps, features)
+    input of a ConvLSTM2D model, each window being split into `n_subsequences` of `window //
+    n_subsequences` steps. Views stay views: splitting the window axis needs no copy.
+    """
+    n_samples, window, n_features = windows.shape
+    if window % n_subsequences:
+        raise ValueError(f"The window ({window}) is not a multiple of n_subsequences ({n_subsequences}).")
+    return windows.reshape(n_samples, n_subsequences, 1, window // n_subsequences, n_features)
+
+
+class WindowDataset:
+    """
+    Sliding windows over a time series, for sequence models such as the ConvLSTM.
+
+    The features are copied once into a contiguous float32 array; every window is a strided view of
+    it, so the windows of the whole history take no more memory than the series itself. Only the
+    mini-batches handed out by `batches` are materialized.
+
+    Sample i is the `window` rows starting at `starts[i]`, and its target is the value of `target`
+    `horizon` rows after the end of the window.
+
+    Attributes:
+        features (list): Columns of the windows.
+        target (str): Column to predict.
+        window (int): Number of time steps per window.
+        horizon (int): Number of steps between the last row of a window and its target.
+        stride (int): Number of steps between the starts of two consecutive windows.
+        starts (np.ndarray): First row of each sample; windows or targets with missing values are left out.
+    """
+
+    def __init__(self, df, target, features=None, window=12, horizon=1, stride=1, dropna=True):
+        if window < 1 or horizon < 1 or stride < 1:
+            raise ValueError("window, horizon and stride must be positive.")
+        self.features = list(df.select_dtypes(include="number").columns if features is None else features)
+        self.target = target
+        self.window = window
+        self.horizon = horizon
+        self.stride = stride
+        self.index = df.index
+
+        self.values = np.ascontiguousarray(df[self.features].to_numpy(dtype=np.float32))
+        if target in self.features:
+            # view on the column of `values`, not a second copy
+            self.target_values = self.values[:, self.features.index(target)]
+        else:
+            self.target_values = df[target].to_numpy(dtype=np.float32)
+        # (n - window + 1, window, n_features) view
+        self._windows = sliding_window_view(self.values, window, axis=0).transpose(0, 2, 1)
+
+        offset = window + horizon - 1
+        starts = np.arange(0, len(self.values) - offset, stride)
+        if dropna:
+            starts = starts[self._complete(starts)]
+        self.starts = starts
+
+    def _complete(self, starts):
+        """
+        Whether the window and the target of each sample have no missing value.
+        """
+        missing_rows = np.isnan(self.values).any(axis=1)
+        missing = np.concatenate([[0], np.cumsum(missing_rows)])
+        window_ok = missing[starts + self.window] == missing[starts]
+        return window_ok & ~np.isnan(self.target_values[starts + self.window + self.horizon - 1])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        start = self.starts[i]
+        return self._windows[start], self.target_values[start + self.window + self.horizon - 1]
+
+    @property
+    def windows(self):
+        """
+        Windows of every sample, shape (samples, window, features): a view unless rows were left out
+        by `dropna`, in which case it is a copy (prefer `batches` for large series).
+        """
+        view = self._windows[:len(self.values) - self.window - self.horizon + 1:self.stride]
+        if len(self.starts) == len(view):
+            return view
+        return self._windows[self.starts]
+
+    @property
+    def targets(self):
+        """
+        Target of every sample, shape (samples,).
+        """
+        return self.target_values[self.starts + self.window + self.horizon - 1]
+
+    @property
+    def target_index(self):
+        """
+        Timestamps of the targets.
+        """
+        return self.index[self.starts + self.window + self.horizon - 1]
+
+    def batches(self, batch_size=256, shuffle=True, seed=None, drop_last=False, n_subsequences=None):
+        """
+        Yields (windows, targets) mini-batches, materialized one at a time.
+
+        Args:
+            batch_size (int): Number of samples per batch.
+            shuffle (bool): Visit the samples in a random order (only an index permutation is drawn).
+            seed (int): Seed of the permutation.
+            drop_last (bool): Skip the last batch if it is incomplete.
+            n_subsequences (int): If set, windows are reshaped for a ConvLSTM (see `to_convlstm`).
+        """
+        order = np.random.default_rng(seed).permutation(len(self.starts)) if shuffle else np.arange(len(self.starts))
+        stop = len(order) - len(order) % batch_size if drop_last else len(order)
+        for begin in range(0, stop, batch_size):
+            starts = self.starts[order[begin:begin + batch_size]]
+            windows = self._windows[starts]
+            if n_subsequences is not None:
+                windows = to_convlstm(windows, n_subsequences)
+            yield windows, self.target_values[starts + self.window + self.horizon - 1]
+
+    def __repr__(self):
+        return (f"WindowDataset(samples={len(self)}, window={self.window}, horizon={self.horizon}, "
+                f"stride={self.stride}, features={len(self.features)})")
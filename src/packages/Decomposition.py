@@ -0,0 +1,175 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .Parallel import map_tasks
+
+# daily and weekly seasonalities of the minute and hourly series
+SEASONAL_PERIODS = {"T": (1440, 10080), "H": (24, 168)}
+
+
+class Decomposition(NamedTuple):
+    """
+    Components of a seasonal decomposition, as arrays of shape (n, k) aligned on `index` and `columns`.
+
+    Attributes:
+        trend (np.ndarray): Centered moving average (NaN on the first and last half period).
+        seasonal (dict): Seasonal component of each period.
+        resid (np.ndarray): What remains once the trend and every seasonal component are removed.
+        index (pd.Index): Index of the decomposed frame.
+        columns (list): Decomposed columns.
+        model (str): "additive" or "multiplicative".
+    """
+    trend: np.ndarray
+    seasonal: dict
+    resid: np.ndarray
+    index: pd.Index
+    columns: list
+    model: str
+
+    def to_frame(self):
+        """
+        The components as a DataFrame with (column, component) columns.
+        """
+        components = {"trend": self.trend, "resid": self.resid}
+        components.update({f"seasonal_{period}": values for period, values in self.seasonal.items()})
+        return pd.concat({name: pd.DataFrame(values, index=self.index, columns=self.columns)
+                          for name, values in components.items()}, axis=1).swaplevel(axis=1).sort_index(axis=1)
+
+
+def centered_moving_average(values, period):
+    """
+    Centered moving average of every column of a 2-D array, computed at once from cumulative sums.
+
+    For an even period, the average is the 2x`period` moving average (half weights on both ends), like
+    `statsmodels.tsa.seasonal.seasonal_decompose`. Missing values are skipped; the first and last half
+    period are NaN.
+
+    Args:
+        values (np.ndarray): Array of shape (n, k), one series per column.
+        period (int): Length of the window.
+
+    Returns:
+        np.ndarray: Array of shape (n, k).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    sums = np.zeros((len(values) + 1, values.shape[1]))
+    counts = np.zeros((len(values) + 1, values.shape[1]))
+    np.cumsum(np.where(present, values, 0.0), axis=0, out=sums[1:])
+    np.cumsum(present, axis=0, out=counts[1:])
+    window_sums = sums[period:] - sums[:-period]
+    window_counts = counts[period:] - counts[:-period]
+    if period % 2 == 0:
+        # two consecutive windows of `period` cover the 2x`period` window, whose end points weigh half
+        window_sums = window_sums[1:] + window_sums[:-1]
+        window_counts = window_counts[1:] + window_counts[:-1]
+    trend = np.full(values.shape, np.nan)
+    half = period // 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trend[half:half + len(window_sums)] = window_sums / window_counts
+    return trend
+
+
+def phase_means(values, period, robust=False):
+    """
+    Average of every column of a 2-D array at each phase of `period`, counted from the first row.
+
+    Args:
+        values (np.ndarray): Array of shape (n, k).
+        period (int): Number of rows per season.
+        robust (bool): Use the median instead of the mean, to resist outliers.
+
+    Returns:
+        np.ndarray: Array of shape (period, k).
+    """
+    n_seasons = -(-len(values) // period)
+    padded = np.full((n_seasons * period, values.shape[1]), np.nan)
+    padded[:len(values)] = values
+    seasons = padded.reshape(n_seasons, period, values.shape[1])
+    return np.nanmedian(seasons, axis=0) if robust else np.nanmean(seasons, axis=0)
+
+
+def _tile(pattern, n_rows):
+    return np.resize(pattern, (-(-n_rows // len(pattern)) * len(pattern), pattern.shape[1]))[:n_rows]
+
+
+def moving_average_decomposition(values, periods, model="additive", robust=False):
+    """
+    Seasonal decomposition of every column of a 2-D array by moving averages, for one or several periods.
+
+    The trend is the centered moving average over the longest period. The seasonal components are then
+    estimated from the shortest period to the longest, each from the phase means of what the previous
+    ones left, and normalized to a zero mean (additive) or a unit mean (multiplicative). With a single
+    period and `robust=False`, this is `seasonal_decompose` with the default filter.
+
+    Returns:
+        tuple: (trend, {period: seasonal}, resid), arrays of the shape of `values`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if model not in ("additive", "multiplicative"):
+        raise ValueError("Invalid model. Please use 'additive' or 'multiplicative'.")
+    if model == "multiplicative" and (values <= 0).any():
+        raise ValueError("The multiplicative model needs strictly positive values.")
+    periods = sorted(periods)
+    trend = centered_moving_average(values, periods[-1])
+
+    multiplicative = model == "multiplicative"
+    detrended = values / trend if multiplicative else values - trend
+    seasonal = {}
+    for period in periods:
+        pattern = phase_means(detrended, period, robust)
+        pattern = pattern / np.nanmean(pattern, axis=0) if multiplicative else pattern - np.nanmean(pattern, axis=0)
+        seasonal[period] = _tile(pattern, len(values))
+        detrended = detrended / seasonal[period] if multiplicative else detrended - seasonal[period]
+    return trend, seasonal, detrended
+
+
+def _stl_column(values, period, robust):
+    """
+    STL decomposition of one series.
+    """
+    from statsmodels.tsa.seasonal import STL
+
+    result = STL(values, period=period, robust=robust).fit()
+    return result.trend, result.seasonal, result.resid
+
+
+def decompose(df, periods=(1440,), columns=None, model="additive", method="ma", robust=False, n_jobs=None):
+    """
+    Seasonal decomposition of the columns of a regularly sampled DataFrame.
+
+    Args:
+        df (pd.DataFrame): Series sampled at a constant step, without gaps in the index.
+        periods (tuple): Seasonal periods, in rows (1440 and 10080 for daily and weekly minute data).
+        columns (list): Columns to decompose (every numeric column by default).
+        model (str): "additive" or "multiplicative".
+        method (str): "ma" for moving averages, vectorized over every column and every period, or "stl"
+            for statsmodels' STL, run for each column in a pool of processes (single period, additive).
+        robust (bool): Median phase averages ("ma") or robust LOESS fits ("stl").
+        n_jobs (int): Number of processes for "stl" (1 to run in the current process).
+
+    Returns:
+        Decomposition: Trend, seasonal components by period and residuals.
+    """
+    columns = list(df.select_dtypes(include="number").columns if columns is None else columns)
+    values = df[columns].to_numpy(dtype=np.float64)
+    periods = tuple(periods)
+    if len(df) < 2 * max(periods):
+        raise ValueError(f"At least two full periods ({2 * max(periods)} rows) are needed.")
+
+    if method == "ma":
+        trend, seasonal, resid = moving_average_decomposition(values, periods, model, robust)
+    elif method == "stl":
+        if len(periods) != 1 or model != "additive":
+            raise ValueError("STL only supports a single period and the additive model.")
+        if np.isnan(values).any():
+            raise ValueError("STL needs series without missing values, fill or drop them first.")
+        tasks = [(values[:, i], periods[0], robust) for i in range(len(columns))]
+        results = map_tasks(_stl_column, tasks, n_jobs)
+        trend, seasonal, resid = (np.column_stack([np.asarray(result[i]) for result in results]) for i in range(3))
+        seasonal = {periods[0]: seasonal}
+    else:
+        raise ValueError("Invalid method. Please use 'ma' or 'stl'.")
+    return Decomposition(trend, seasonal, resid, df.index, columns, model)
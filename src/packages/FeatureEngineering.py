@@ -1,7 +1,160 @@
+from collections import deque
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
-import numpy as np
-import holidays
+
+from .Instrumentation import stage
+
+# calendar features, in the order create_variables adds them
+CALENDAR_FEATURES = ["is_daytime", "is_weekend", "hour_sin", "is_ferie", "is_winter", "is_summer"]
+
+# raw columns removed by create_variables once their lags are built
+NOT_LAGGED_COLUMNS = ["Global_active_power", "Global_reactive_power", "Voltage",
+                      "Global_intensity", "Sub_metering_1", "Sub_metering_2",
+                      "Sub_metering_3", "other_submetering"]
+
+# statistics of the target computed by `_window_rolling`, named f"{target}_{statistic}_{window in minutes}"
+ROLLING_STATISTICS = ("mean", "min", "max", "std")
+
+# columns of the processed frame that are not numeric (datetime64 and category)
+NON_NUMERIC_COLUMNS = ["Date", "Time"]
+
+_HOUR = pd.Timedelta(hours=1).value
+
+
+def _block_scan(values, window, ufunc, identity):
+    """
+    Block prefix and suffix scans of `values` (van Herk / Gil-Werman).
+
+    The series is cut into blocks of `window` values, so a window always spans the end of one block
+    and the start of the next one.
+    """
+    n_blocks = -(-len(values) // window)
+    padded = np.full(n_blocks * window, identity)
+    padded[:len(values)] = values
+    blocks = padded.reshape(n_blocks, window)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return prefix, suffix
+
+
+def _sliding_extreme(values, ufunc, identity, window):
+    # min or max of each full window, O(n) whatever the window length
+    prefix, suffix = _block_scan(values, window, ufunc, identity)
+    n_rows = len(values)
+    return ufunc(suffix[:n_rows - window + 1], prefix[window - 1:n_rows])
+
+
+def _sliding_sum(values, window):
+    # sum of each full window; the scans restart at every block, so rounding errors stay
+    # proportional to the window and do not accumulate over the whole series
+    prefix, suffix = _block_scan(values, window, np.add, 0.0)
+    n_rows = len(values)
+    sums = suffix[:n_rows - window + 1] + prefix[window - 1:n_rows]
+    # a window starting on a block boundary is exactly that block
+    sums[::window] = prefix[window - 1:n_rows:window]
+    return sums
+
+
+def rolling_statistics(values, windows, statistics=ROLLING_STATISTICS):
+    """
+    Computes every statistic for every window over `values` with a single pass of cumulative sums.
+
+    Matches `pd.Series.rolling(window)` with its default `min_periods`: the first `window - 1` values
+    and every window containing a NaN are NaN, and the std uses ddof=1. The series is centered and
+    its squares computed once for all windows; each window then only costs a few block prefix/suffix
+    scans (sums for mean and std, extremes for min and max), whatever its length.
+
+    Args:
+        values (np.ndarray): 1-D series.
+        windows (list): Window lengths, in number of rows.
+        statistics (tuple): Statistics among "mean", "min", "max" and "std".
+
+    Returns:
+        dict: (statistic, window) -> np.ndarray of the same length as `values`.
+    """
+    unknown = set(statistics) - set(ROLLING_STATISTICS)
+    if unknown:
+        raise ValueError(
+            "Invalid statistic. Please use 'mean', 'min', 'max' or 'std'.")
+    values = np.asarray(values, dtype=np.float64)
+    n_rows = len(values)
+    missing = np.isnan(values)
+    has_missing = missing.any()
+    n_missing = np.concatenate([[0], np.cumsum(missing)])
+
+    # centering keeps the sums of squares far from cancellation
+    center = values[~missing].mean() if not missing.all() else 0.0
+    centered = np.where(missing, 0.0, values - center)
+    squared = centered ** 2
+    filled = {"min": (np.where(missing, np.inf, values), np.minimum, np.inf),
+              "max": (np.where(missing, -np.inf, values), np.maximum, -np.inf)}
+
+    results = {}
+    for window in windows:
+        if window > n_rows:
+            results.update({(statistic, window): np.full(n_rows, np.nan) for statistic in statistics})
+            continue
+        # statistics of the full windows, i.e. of rows window - 1 onwards
+        tails = {}
+        if "mean" in statistics or "std" in statistics:
+            window_sum = _sliding_sum(centered, window)
+            tails["mean"] = window_sum / window + center
+        if "std" in statistics:
+            if window < 2:
+                tails["std"] = np.full(n_rows - window + 1, np.nan)
+            else:
+                variance = (_sliding_sum(squared, window) - window_sum ** 2 / window) / (window - 1)
+                tails["std"] = np.sqrt(np.clip(variance, 0, None))
+        for statistic in ("min", "max"):
+            if statistic in statistics:
+                tails[statistic] = _sliding_extreme(*filled[statistic], window)
+
+        for statistic in statistics:
+            result = np.empty(n_rows)
+            result[:window - 1] = np.nan
+            result[window - 1:] = tails[statistic]
+            if has_missing:
+                result[window - 1:][n_missing[window:] - n_missing[:-window] > 0] = np.nan
+            results[(statistic, window)] = result
+    return results
+
+
+@lru_cache(maxsize=8)
+def calendar_table(first_year, last_year):
+    """
+    Calendar features for every hour of the years `first_year` to `last_year`.
+
+    They only depend on the hour, the date and the month, so they are computed once per hour
+    (and holidays looked up once per date) and memoized, then broadcast onto minute indexes.
+    """
+    import holidays
+
+    hours = pd.date_range(f"{first_year}-01-01", f"{last_year}-12-31 23:00", freq="H")
+    fr_holidays = holidays.France(years=range(first_year, last_year + 1))
+    holiday_dates = pd.DatetimeIndex(list(fr_holidays.keys()))
+    return pd.DataFrame({
+        "is_daytime": np.where(hours.hour.isin(range(7, 20)), 1, 0),
+        "is_weekend": hours.dayofweek.isin([5, 6]).astype(int),
+        "hour_sin": np.sin(2 * np.pi * hours.hour / 24),
+        "is_ferie": hours.normalize().isin(holiday_dates).astype(int),
+        "is_winter": np.where(hours.month.isin([12, 1, 2]), 1, 0),
+        "is_summer": np.where(hours.month.isin([6, 7, 8]), 1, 0),
+    }, index=hours)
+
+
+def calendar_features(index, columns=CALENDAR_FEATURES):
+    """
+    Broadcasts the memoized `calendar_table` onto a (minute-level) DatetimeIndex.
+
+    Returns:
+        dict: feature name -> np.ndarray aligned on `index`.
+    """
+    table = calendar_table(index.min().year, index.max().year)
+    # row of the hourly table holding each timestamp, computed on the raw int64 nanoseconds
+    positions = (index.asi8 - table.index[0].value) // _HOUR
+    return {col: table[col].to_numpy()[positions] for col in columns}
 
 
 class FeatureEngineer:
@@ -10,94 +163,250 @@ class FeatureEngineer:
         self.df = df
         self.target = target
 
-    def create_variables(self, lag, time, window_size):
-        self._lag_creation(lag, time)
+    def create_variables(self, lag, time, window_size, lag_columns=None):
+        self._lag_creation(lag, time, lag_columns)
         self._window_rolling(window_size, time)
-        self._day_and_night()
-        self._finally_the_weekend()
-        self._sinus_hour()
-        self._is_ferie()
-        self._winter_is_coming()
+        self._calendar_features()
         self._drop_not_lagged()
         self.df = self.df.dropna()
         return self.df
 
-    def _lag_creation(self, lag, time="day"):
-        if isinstance(lag, int):
-            lag = [lag]
+    @staticmethod
+    def _to_minutes(values, time="day"):
+        if isinstance(values, int):
+            values = [values]
         if time == "day":
-            lag_min = [l*60*24 for l in lag]
+            return values, [v*60*24 for v in values]
         elif time == "hour":
-            lag_min = [l*60 for l in lag]
+            return values, [v*60 for v in values]
         elif time == "minute":
-            lag_min = lag
-        else:
-            raise ValueError(
-                "Invalid time value. Please use 'day', 'hour' or 'minute.")
-
-        new_cols = []
-        for col in self.df.columns:
-            for index, l in enumerate(lag_min):
-                new_col = self.df[col].shift(l)
-                new_col.name = f"{col}_lag{lag[index]}{time[0]}"
-                new_cols.append(new_col)
-        self.df = pd.concat([self.df] + new_cols, axis=1)
- 
-
-    def _window_rolling(self, window_size, time="day"):
-        if isinstance(window_size, int):
-            window_size = [window_size]
-            if time == "day":
-                window_min = [l*60*24 for l in window_size]
-            elif time == "hour":
-                window_min = [l*60 for l in window_size]
-            elif time == "minute":
-                window_min = window_size
-            else:
-                raise ValueError(
-                    "Invalid time value. Please use 'day', 'hour' or 'minute.'")
+            return values, list(values)
+        raise ValueError(
+            "Invalid time value. Please use 'day', 'hour' or 'minute.")
+
+    @stage
+    def _lag_creation(self, lag, time="day", columns=None):
+        """
+        Lags every column of `columns` (all numeric columns by default) by every requested lag.
+
+        All lags are written into a single preallocated 2-D block which becomes the new frame as is;
+        only the existing columns are copied next to it, instead of copying the whole frame once per
+        lag and again in `pd.concat`.
+        """
+        lag, lag_min = self._to_minutes(lag, time)
+        if columns is None:
+            columns = self.df.select_dtypes(include="number").columns
+        dtype = np.result_type(np.float32, *self.df[columns].dtypes)
+        n_rows = len(self.df)
+
+        # one row per lagged column, so that each lag is a contiguous slice of the block
+        block = np.empty((len(columns) * len(lag), n_rows), dtype=dtype)
+        names = []
+        for i, col in enumerate(columns):
+            values = self.df[col].to_numpy(dtype=dtype)
+            for j, l in enumerate(lag_min):
+                k = i * len(lag) + j
+                l = min(l, n_rows)
+                block[k, :l] = np.nan
+                block[k, l:] = values[:n_rows - l]
+                names.append(f"{col}_lag{lag[j]}{time[0]}")
 
+        lagged = pd.DataFrame(block.T, index=self.df.index, columns=names, copy=False)
+        for position, col in enumerate(self.df.columns):
+            lagged.insert(position, col, self.df[col])
+        self.df = lagged
+
+    @stage
+    def _window_rolling(self, window_size, time="day", statistics=ROLLING_STATISTICS):
+        window_size, window_min = self._to_minutes(window_size, time)
+        rolled = rolling_statistics(self.df[self.target].to_numpy(), window_min, statistics)
         for window in window_min:
-            self.df[f'{self.target}_mean_{window}'] = self.df[self.target].rolling(
-                window).mean()
-            self.df[f'{self.target}_min_{window}'] = self.df[self.target].rolling(
-                window).min()
-            self.df[f'{self.target}_max_{window}'] = self.df[self.target].rolling(
-                window).max()
-            self.df[f'{self.target}_std_{window}'] = self.df[self.target].rolling(
-                window).std()
+            for statistic in statistics:
+                self.df[f'{self.target}_{statistic}_{window}'] = rolled[(statistic, window)]
+
+    @stage
+    def _calendar_features(self, columns=CALENDAR_FEATURES):
+        for col, values in calendar_features(self.df.index, columns).items():
+            self.df[col] = values
 
     def _day_and_night(self):
-        self.df['hour'] = self.df.index.hour
-        self.df['is_daytime'] = np.where(
-            self.df['hour'].isin(range(7, 20)), 1, 0)
-        self.df.drop(columns='hour', inplace=True)
+        self._calendar_features(["is_daytime"])
 
     def _sinus_hour(self):
-        self.df['hour'] = self.df.index.hour
-        self.df['hour_sin'] = np.sin(2 * np.pi * self.df['hour'] / 24)
-        self.df.drop(columns='hour', inplace=True)
-        
+        self._calendar_features(["hour_sin"])
+
     def _finally_the_weekend(self):
-        self.df['is_weekend'] = self.df.index.dayofweek.isin([
-            5, 6]).astype(int)
+        self._calendar_features(["is_weekend"])
 
     def _is_ferie(self):
         # Create a new column for whether the date is a public holiday in France
-        fr_holidays = holidays.France()
-        idx = pd.DatetimeIndex(self.df.index.date)
-        self.df['is_ferie'] = idx.isin(fr_holidays).astype(int)
+        self._calendar_features(["is_ferie"])
 
     def _winter_is_coming(self):
-        self.df['is_winter'] = np.where((self.df.index.month == 12) | (
-            self.df.index.month == 1) | (self.df.index.month == 2), 1, 0)
-        self.df['is_summer'] = np.where((self.df.index.month == 6) | (
-            self.df.index.month == 7) | (self.df.index.month == 8), 1, 0)
+        self._calendar_features(["is_winter", "is_summer"])
 
+    @stage
     def _drop_not_lagged(self):
-        self.df.drop(columns=["Global_active_power","Global_reactive_power","Voltage",
-                      "Global_intensity", "Sub_metering_1", "Sub_metering_2",
-                      "Sub_metering_3" , "other_submetering"], inplace=True)
+        # column by column, so that only the small blocks holding these columns are rewritten
+        for col in NOT_LAGGED_COLUMNS:
+            del self.df[col]
         
         
     
+
+
+class OnlineFeatureEngineer:
+    """
+    Streaming counterpart of `FeatureEngineer.create_variables`, for one-minute-ahead scoring on live feeds.
+
+    Keeps a ring buffer of the last values needed by the lags and running aggregates for each rolling
+    window (sums and monotonic deques for min/max), so that each new observation costs constant time.
+    Like `create_variables`, lags and windows are counted in rows, so observations are expected one per
+    minute, without gaps.
+
+    Attributes:
+        feature_names (list): Columns of the returned feature vectors, in `create_variables` order.
+    """
+
+    def __init__(self, columns, target, lag, time, window_size, lag_columns=None,
+                 statistics=ROLLING_STATISTICS):
+        """
+        Args:
+            columns (list or pd.Series): Columns of the processed frame given to `create_variables`, in
+                order, or its `dtypes`.
+            target (str): Target column.
+            lag, time, window_size, lag_columns: Same as `FeatureEngineer.create_variables`
+                (`lag_columns` must only hold numeric columns). By default, like `create_variables`,
+                every numeric column is lagged: those of `columns` if it holds dtypes, otherwise all
+                but `NON_NUMERIC_COLUMNS`.
+            statistics (tuple): Rolling statistics, as in `FeatureEngineer._window_rolling`.
+        """
+        self.target = target
+        self.statistics = statistics
+        lag, self.lag_min = FeatureEngineer._to_minutes(lag, time)
+        _, self.window_min = FeatureEngineer._to_minutes(window_size, time)
+        if lag_columns is None and isinstance(columns, pd.Series):
+            lag_columns = [col for col, dtype in columns.items() if pd.api.types.is_numeric_dtype(dtype)]
+        elif lag_columns is None:
+            lag_columns = [col for col in columns if col not in NON_NUMERIC_COLUMNS]
+        columns = list(columns.index if isinstance(columns, pd.Series) else columns)
+        self.lag_columns = list(lag_columns)
+        self.kept_columns = [col for col in columns if col not in NOT_LAGGED_COLUMNS]
+
+        self.feature_names = (
+            self.kept_columns
+            + [f"{col}_lag{l}{time[0]}" for col in self.lag_columns for l in lag]
+            + [f"{target}_{statistic}_{window}" for window in self.window_min for statistic in statistics]
+            + CALENDAR_FEATURES)
+
+        self._buffered = list(dict.fromkeys(self.lag_columns + [target]))
+        self._lag_positions = [self._buffered.index(col) for col in self.lag_columns]
+        self._target_position = self._buffered.index(target)
+        self._capacity = max(self.lag_min + self.window_min) + 1
+        self._buffer = np.full((self._capacity, len(self._buffered)), np.nan)
+        self._tick = -1
+        self._sums = {window: [0.0, 0.0, 0] for window in self.window_min}
+        self._extremes = {window: (deque(), deque()) for window in self.window_min}
+        self._calendar = (None, None, None)
+
+    @classmethod
+    def from_frame(cls, df, target, lag, time, window_size, lag_columns=None,
+                   statistics=ROLLING_STATISTICS):
+        """
+        Online engineer for the columns of a processed frame, warmed up on its last rows.
+        """
+        online = cls(df.dtypes, target, lag, time, window_size, lag_columns, statistics)
+        return online.warm_up(df)
+
+    def update(self, timestamp, observation):
+        """
+        Adds the observation of a new minute and returns its feature vector.
+
+        Args:
+            timestamp (pd.Timestamp): Minute of the observation.
+            observation (dict or pd.Series): Values of the processed columns for that minute.
+
+        Returns:
+            pd.Series: The row `create_variables` would produce for `timestamp`, or None while the
+                lags and windows are warming up or if a feature is missing (rows `dropna` removes).
+        """
+        self._tick += 1
+        tick, capacity = self._tick, self._capacity
+        self._buffer[tick % capacity] = [observation[col] for col in self._buffered]
+
+        features = [observation[col] for col in self.kept_columns]
+        for position in self._lag_positions:
+            for l in self.lag_min:
+                features.append(self._buffer[(tick - l) % capacity, position] if tick >= l else np.nan)
+        for window in self.window_min:
+            rolled = self.__roll(window)
+            features.extend(rolled[statistic] for statistic in self.statistics)
+        features.extend(self.__calendar(pd.Timestamp(timestamp)))
+
+        features = pd.Series(features, index=self.feature_names, name=timestamp)
+        return None if features.isna().any() else features
+
+    def warm_up(self, df):
+        """
+        Feeds the last rows of a processed frame, so that the next `update` returns features at once.
+        """
+        tail = df.iloc[-self._capacity:]
+        for timestamp, (_, row) in zip(tail.index, tail.iterrows()):
+            self.update(timestamp, row)
+        return self
+
+    def __roll(self, window):
+        tick = self._tick
+        sums = self._sums[window]
+        lows, highs = self._extremes[window]
+        incoming = self._buffer[tick % self._capacity, self._target_position]
+        # value leaving the window, if the window was already full
+        if tick < window:
+            outgoing = 0.0
+        else:
+            outgoing = self._buffer[(tick - window) % self._capacity, self._target_position]
+
+        if np.isnan(incoming):
+            sums[2] += 1
+        else:
+            sums[0] += incoming
+            sums[1] += incoming ** 2
+            while lows and lows[-1][1] >= incoming:
+                lows.pop()
+            lows.append((tick, incoming))
+            while highs and highs[-1][1] <= incoming:
+                highs.pop()
+            highs.append((tick, incoming))
+        if np.isnan(outgoing):
+            sums[2] -= 1
+        else:
+            sums[0] -= outgoing
+            sums[1] -= outgoing ** 2
+        for extremes in (lows, highs):
+            while extremes and extremes[0][0] <= tick - window:
+                extremes.popleft()
+        if tick % window == 0:
+            # exact recomputation once per window, so rounding errors of the running sums do not drift
+            values = self.__window_values(window)
+            sums[0], sums[1] = np.nansum(values), np.nansum(values ** 2)
+
+        if tick < window - 1 or sums[2]:
+            return dict.fromkeys(self.statistics, np.nan)
+        mean = sums[0] / window
+        variance = (sums[1] - sums[0] ** 2 / window) / (window - 1) if window > 1 else np.nan
+        return {"mean": mean,
+                "min": lows[0][1],
+                "max": highs[0][1],
+                "std": np.sqrt(max(variance, 0.0)) if window > 1 else np.nan}
+
+    def __window_values(self, window):
+        positions = np.arange(max(self._tick - window + 1, 0), self._tick + 1) % self._capacity
+        return self._buffer[positions, self._target_position]
+
+    def __calendar(self, timestamp):
+        year, start, values = self._calendar
+        if timestamp.year != year:
+            table = calendar_table(timestamp.year, timestamp.year)
+            start, values = table.index[0].value, table[CALENDAR_FEATURES].to_numpy(dtype=np.float64)
+            self._calendar = (timestamp.year, start, values)
+        return values[(timestamp.value - start) // _HOUR]
@@ -1,11 +1,156 @@
+from typing import NamedTuple
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-def filter_correlated_variables(df, target, corr_measure="pearson", min_corr=0, max_corr=1, max_var_corr=0.7):
-    # Calculate correlations with the target variable
-    corr_matrix = df.corr(corr_measure)
+
+class CorrelationSelection(NamedTuple):
+    """
+    Result of `select_correlated_variables`.
+
+    Attributes:
+        selected (list): Selected variables, by decreasing correlation with the target.
+        dropped_pairs (pd.DataFrame): One row per dropped variable: the variable kept instead ('kept'),
+            the dropped one ('dropped'), their correlation ('pair_corr') and their correlations with the
+            target ('kept_target_corr', 'dropped_target_corr').
+        target_corrs (pd.Series): Absolute correlation with the target of every variable within
+            [min_corr, max_corr], sorted in decreasing order.
+    """
+    selected: list
+    dropped_pairs: pd.DataFrame
+    target_corrs: pd.Series
+
+
+def correlation_matrix(df, corr_measure="pearson", block_size=100_000, sample_size=None, random_state=0):
+    """
+    Correlation matrix of all the columns of `df`, accumulated over blocks of rows.
+
+    Each block of rows is centered on the column means in float64, then converted to float32 and
+    multiplied in float32; block results are accumulated in float64. Memory stays bounded by the block size instead of pandas' float64 copy of
+    the whole frame. Missing values are handled pairwise, like `DataFrame.corr`. For Spearman, the
+    columns are rank-transformed once and then go through the same engine (with missing values, ranks
+    are therefore computed per column rather than per pair of columns). Kendall has no blockwise form
+    and falls back to `DataFrame.corr`, so use it with `sample_size`.
+
+    Args:
+        df (pd.DataFrame): Features and target; non-numeric columns (e.g. 'Date' and 'Time') are
+            skipped, like `DataFrame.corr`.
+        corr_measure (str): "pearson", "spearman" or "kendall".
+        block_size (int): Number of rows per block.
+        sample_size (int): If set, the correlations are estimated on that many rows drawn at random
+            without replacement (see `correlation_bounds` for their confidence intervals).
+        random_state (int): Seed of the row sampling.
+
+    Returns:
+        pd.DataFrame: The correlation matrix.
+    """
+    df = df.select_dtypes(include=["number", "bool"])
+    if sample_size is not None and sample_size < len(df):
+        rows = np.sort(np.random.default_rng(random_state).choice(len(df), sample_size, replace=False))
+        df = df.iloc[rows]
+    if corr_measure == "kendall":
+        return df.corr("kendall")
+    if corr_measure == "spearman":
+        df = df.rank()
+    elif corr_measure != "pearson":
+        raise ValueError("Invalid corr_measure. Please use 'pearson', 'spearman' or 'kendall'.")
+
+    # centering on the column means, before the float32 cast, keeps large offsets from eating the precision
+    means = df.mean().to_numpy()
+    has_missing = df.isna().to_numpy().any()
+    n_cols = df.shape[1]
+    counts, sums, squares = (np.zeros((n_cols, n_cols)) for _ in range(3))
+    products = np.zeros((n_cols, n_cols))
+    for start in range(0, len(df), block_size):
+        block = (df.iloc[start:start + block_size].to_numpy(dtype=np.float64) - means).astype(np.float32)
+        if has_missing:
+            present = ~np.isnan(block)
+            block = np.where(present, block, np.float32(0))
+            present = present.astype(np.float32)
+            # [i, j] sums over the rows where both column i and column j are present
+            counts += present.T @ present
+            sums += block.T @ present
+            squares += (block * block).T @ present
+        else:
+            counts += len(block)
+            sums += block.sum(axis=0)[:, None]
+            squares += (block * block).sum(axis=0)[:, None]
+        products += block.T @ block
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = products - sums * sums.T / counts
+        variance = squares - sums ** 2 / counts
+        corr = covariance / np.sqrt(variance * variance.T)
+    corr[counts < 2] = np.nan
+    np.fill_diagonal(corr, np.where(np.diag(variance) > 0, 1.0, np.nan))
+    return pd.DataFrame(np.clip(corr, -1, 1), index=df.columns, columns=df.columns)
+
+
+def correlation_bounds(corr, n_obs, corr_measure="pearson", confidence=0.95):
+    """
+    Confidence bounds of correlations estimated on `n_obs` rows (Fisher z-transform).
+
+    The standard errors of Spearman and Kendall use Fieller's approximations.
+
+    Returns:
+        tuple: (lower bounds, upper bounds), shaped like `corr`.
+    """
+    from scipy.stats import norm
+
+    standard_errors = {"pearson": np.sqrt(1 / (n_obs - 3)),
+                       "spearman": np.sqrt(1.06 / (n_obs - 3)),
+                       "kendall": np.sqrt(0.437 / (n_obs - 4))}
+    margin = norm.ppf(0.5 + confidence / 2) * standard_errors[corr_measure]
+    z = np.arctanh(np.clip(corr, -1 + 1e-12, 1 - 1e-12))
+    return np.tanh(z - margin), np.tanh(z + margin)
+
+
+def _prune_correlated(pair_corrs, target_corrs, max_var_corr):
+    """
+    For each pair of variables correlated above `max_var_corr`, drops the one less correlated with the
+    target.
+
+    The pairs are visited in the same order as a double loop over the upper triangle, skipping pairs
+    where a variable is already dropped, so the result is identical; only the loop over the rows
+    remains, each row being handled with array operations.
+
+    Args:
+        pair_corrs (np.ndarray): Absolute correlations between the variables, shape (p, p).
+        target_corrs (np.ndarray): Absolute correlations of the variables with the target, shape (p,).
+        max_var_corr (float): Threshold above which two variables are redundant.
+
+    Returns:
+        tuple: Boolean mask of the dropped variables, and (kept, dropped) positions of the pair that
+            caused each drop.
+    """
+    correlated = np.triu(pair_corrs > max_var_corr, k=1)
+    dropped = np.zeros(len(target_corrs), dtype=bool)
+    pairs = []
+    for i in np.flatnonzero(correlated.any(axis=1)):
+        if dropped[i]:
+            continue
+        partners = np.flatnonzero(correlated[i] & ~dropped)
+        # i drops its partners until it meets one more correlated with the target, which drops i
+        stronger = np.flatnonzero(~(target_corrs[i] >= target_corrs[partners]))
+        weaker = partners[:stronger[0]] if len(stronger) else partners
+        dropped[weaker] = True
+        pairs.extend((i, j) for j in weaker)
+        if len(stronger):
+            dropped[i] = True
+            pairs.append((partners[stronger[0]], i))
+    return dropped, pairs
+
+
+def select_correlated_variables(df, target, corr_measure="pearson", min_corr=0, max_corr=1, max_var_corr=0.7,
+                                block_size=100_000, sample_size=None, random_state=0):
+    """
+    Selects the variables correlated with the target, dropping the redundant ones, without plotting.
+
+    Returns:
+        CorrelationSelection: Selected variables, dropped pairs and correlations with the target.
+    """
+    # Calculate correlations once, with the target variable and between all the variables
+    corr_matrix = correlation_matrix(df, corr_measure, block_size, sample_size, random_state)
     target_corrs = corr_matrix[target].abs()
 
     # Filter variables based on min and max correlation with the target variable
@@ -14,29 +159,33 @@ def filter_correlated_variables(df, target, corr_measure="pearson", min_corr=0,
         filtered_vars = filtered_vars.drop(target)
 
     # Check correlations between filtered variables
-    filtered_vars_corr = df[filtered_vars].corr(corr_measure).abs()
-    
+    filtered_vars_corr = corr_matrix.loc[filtered_vars, filtered_vars].abs().to_numpy()
+    filtered_target_corrs = target_corrs[filtered_vars]
+
     # Find highly correlated pairs of variables and discard the one with lower correlation to the target variable
-    dropped_vars = set()
-    for i in range(len(filtered_vars_corr)):
-        for j in range(i + 1, len(filtered_vars_corr)):
-            if filtered_vars_corr.iloc[i, j] > max_var_corr:
-                var_i = filtered_vars[i]
-                var_j = filtered_vars[j]
+    dropped, pairs = _prune_correlated(filtered_vars_corr, filtered_target_corrs.to_numpy(), max_var_corr)
+    kept, removed = (np.array([pair[k] for pair in pairs], dtype=int) for k in (0, 1))
+    dropped_pairs = pd.DataFrame({'kept': filtered_vars[kept],
+                                  'dropped': filtered_vars[removed],
+                                  'pair_corr': filtered_vars_corr[kept, removed],
+                                  'kept_target_corr': filtered_target_corrs.to_numpy()[kept],
+                                  'dropped_target_corr': filtered_target_corrs.to_numpy()[removed]})
 
-                if var_i in dropped_vars or var_j in dropped_vars:
-                    continue
+    filtered_target_corrs = filtered_target_corrs.sort_values(ascending=False)
+    dropped_vars = set(dropped_pairs['dropped'])
+    selected = [var for var in filtered_target_corrs.index if var not in dropped_vars]
+    return CorrelationSelection(selected, dropped_pairs, filtered_target_corrs)
 
-                if target_corrs[var_i] >= target_corrs[var_j]:
-                    dropped_vars.add(var_j)
-                else:
-                    dropped_vars.add(var_i)
 
-    # Plot correlations with the target variable
-    selected_vars = list(set(filtered_vars) - dropped_vars)
-    target_corrs = target_corrs[selected_vars]
-    target_corrs.sort_values(ascending=False, inplace=True)
-    
+def plot_selection(selection, target, corr_measure="pearson"):
+    """
+    Bar plot of the correlations between the target and the selected variables.
+    """
+    # imported here so that the selection itself does not pay for matplotlib and seaborn
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    target_corrs = selection.target_corrs[selection.selected]
     plt.figure(figsize=(10, 5))
     sns.barplot(x=target_corrs.index, y=target_corrs)
     plt.xlabel('Features')
@@ -45,6 +194,14 @@ def filter_correlated_variables(df, target, corr_measure="pearson", min_corr=0,
     plt.xticks(rotation=90)
     plt.show()
 
-    # Return filtered variables
-    return selected_vars
 
+def filter_correlated_variables(df, target, corr_measure="pearson", min_corr=0, max_corr=1, max_var_corr=0.7,
+                                block_size=100_000, sample_size=None, random_state=0, plot=True):
+    selection = select_correlated_variables(df, target, corr_measure, min_corr, max_corr, max_var_corr,
+                                            block_size, sample_size, random_state)
+    # Plot correlations with the target variable
+    if plot:
+        plot_selection(selection, target, corr_measure)
+
+    # Return filtered variables
+    return selection.selected
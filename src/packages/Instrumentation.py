@@ -0,0 +1,195 @@
+"""
+Stage-level instrumentation of the `DataProcessor` and `FeatureEngineer` pipelines.
+
+Every private stage decorated with `stage` reports, when instrumentation is enabled, its duration, the
+rows, columns and bytes of `self.df` before and after, and optionally a cProfile or tracemalloc
+capture, to the registered sinks:
+
+    from packages import Instrumentation
+
+    collector = Instrumentation.MemorySink()
+    with Instrumentation.instrumented(collector, Instrumentation.JsonLinesSink("stages.jsonl")):
+        DataProcessor(df).process_data(numeric_cols)
+    collector.to_frame()
+
+When disabled (the default), a decorated stage costs one extra function call and a global lookup.
+"""
+import functools
+import io
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+CAPTURES = (None, "cprofile", "tracemalloc")
+
+_enabled = False
+_sinks = []
+_capture = None
+
+
+class LoggingSink:
+    """
+    Logs every record as one line on `logger`.
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+        self.level = level
+
+    def __call__(self, record):
+        self.logger.log(self.level, "%s: %.3fs, rows %s -> %s, %+d bytes", record["stage"], record["wall_s"],
+                        record["rows_in"], record["rows_out"], record["bytes_delta"])
+
+
+class JsonLinesSink:
+    """
+    Appends every record as a JSON line to `path`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class MemorySink:
+    """
+    Keeps every record in memory.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.records)
+
+    def clear(self):
+        self.records.clear()
+
+
+def enable(*sinks, capture=None):
+    """
+    Turns instrumentation on, sending the records to `sinks` (in addition to those already registered).
+
+    Args:
+        sinks: Callables receiving each record (a dict).
+        capture (str): None, "cprofile" (adds the top functions of each stage to its record) or
+            "tracemalloc" (adds the peak and net Python allocations of each stage).
+    """
+    global _enabled, _capture
+    if capture not in CAPTURES:
+        raise ValueError(f"Invalid capture. Please use one of {CAPTURES}.")
+    _sinks.extend(sinks)
+    _capture = capture
+    _enabled = True
+
+
+def disable():
+    """
+    Turns instrumentation off and unregisters every sink.
+    """
+    global _enabled, _capture
+    _enabled = False
+    _capture = None
+    _sinks.clear()
+
+
+def is_enabled():
+    return _enabled
+
+
+@contextmanager
+def instrumented(*sinks, capture=None):
+    """
+    Enables instrumentation for the duration of a `with` block.
+    """
+    enable(*sinks, capture=capture)
+    try:
+        yield
+    finally:
+        disable()
+
+
+def _frame_shape(obj):
+    df = getattr(obj, "df", None)
+    if df is None:
+        return None, None, 0
+    # shallow memory usage: deep=True would scan every string of object columns
+    return len(df), df.shape[1], int(df.memory_usage(index=True, deep=False).sum())
+
+
+def _profile_text(profiler, limit=15):
+    import pstats
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+
+def _run_instrumented(name, func, obj, args, kwargs):
+    rows_in, cols_in, bytes_in = _frame_shape(obj)
+    capture = _capture
+    record = {"stage": f"{type(obj).__name__}.{name}", "timestamp": time.time()}
+
+    if capture == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        result = profiler.runcall(func, obj, *args, **kwargs)
+        record["wall_s"] = time.perf_counter() - started
+        record["profile"] = _profile_text(profiler)
+    elif capture == "tracemalloc":
+        import tracemalloc
+
+        # nested stages share the tracing started by the outermost one
+        owner = not tracemalloc.is_tracing()
+        if owner:
+            tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            result = func(obj, *args, **kwargs)
+        finally:
+            record["wall_s"] = time.perf_counter() - started
+            after, peak = tracemalloc.get_traced_memory()
+            if owner:
+                tracemalloc.stop()
+        record["alloc_peak_bytes"] = peak - before
+        record["alloc_delta_bytes"] = after - before
+    else:
+        started = time.perf_counter()
+        result = func(obj, *args, **kwargs)
+        record["wall_s"] = time.perf_counter() - started
+
+    rows_out, cols_out, bytes_out = _frame_shape(obj)
+    record.update(rows_in=rows_in, rows_out=rows_out, cols_in=cols_in, cols_out=cols_out,
+                  bytes_in=bytes_in, bytes_out=bytes_out, bytes_delta=bytes_out - bytes_in)
+    for sink in _sinks:
+        sink(record)
+    return result
+
+
+def stage(func):
+    """
+    Decorates a pipeline stage (a method of an object holding its frame in `self.df`) so that it reports
+    to the sinks when instrumentation is enabled.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not _enabled:
+            return func(self, *args, **kwargs)
+        return _run_instrumented(func.__name__, func, self, args, kwargs)
+    return wrapper
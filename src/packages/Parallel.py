@@ -0,0 +1,34 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def map_tasks(func, tasks, n_jobs=None, initializer=None, initargs=()):
+    """
+    Calls `func(*task)` for every task of `tasks` in a pool of processes, and returns the results in order.
+
+    Args:
+        func: Module-level function, so that it can be sent to the worker processes.
+        tasks (list): Tuples of arguments of `func`.
+        n_jobs (int): Number of processes (None for one per CPU, 1 to run every task in the current process).
+        initializer: Called with `initargs` in every worker (or once in the current process) before the
+            tasks. Workers are then forked where the platform allows it, so that they inherit `initargs`
+            instead of receiving a pickled copy.
+        initargs (tuple): Arguments of `initializer`.
+
+    Returns:
+        list: `func(*task)` for every task.
+    """
+    tasks = list(tasks)
+    if n_jobs == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [func(*task) for task in tasks]
+    if not tasks:
+        return []
+
+    context = None
+    if initializer is not None and "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context,
+                             initializer=initializer, initargs=initargs) as executor:
+        return list(executor.map(func, *zip(*tasks)))
@@ -1,8 +1,95 @@
 import numpy as np
 import pandas as pd
-import numpy as np
-from scipy.fft import fft
-from datetime import datetime
+
+from .Instrumentation import stage
+
+# À incrémenter à chaque modification du pipeline de `DataProcessor` : invalide les caches de données traitées
+PIPELINE_VERSION = 4
+
+# 'Time' devient une catégorie fixe de toutes les heures de la journée : un plan de types figé sur un historique
+# reste valable pour des lignes dont l'heure n'y figurait pas (une catégorie inconnue deviendrait NaN)
+TIME_DTYPE = pd.CategoricalDtype(
+    [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(24 * 3600)])
+
+
+def _broadcast(decoded, codes, missing):
+    # le code -1 de pd.factorize (valeur manquante) pointe sur `missing`, ajouté en fin de tableau
+    return np.append(decoded, np.array([missing], dtype=decoded.dtype))[codes]
+
+
+def parse_timestamps(dates, times):
+    """
+    Analyse les colonnes 'Date' (dd/mm/yyyy) et 'Time' (hh:mm:ss) une seule fois chacune.
+
+    Les données minute ne comptent qu'environ 1 440 dates et 1 440 heures distinctes : chaque valeur
+    distincte est analysée une seule fois de manière vectorisée, puis diffusée sur toutes les lignes.
+
+    Args:
+        dates (pd.Series): Colonne 'Date' brute.
+        times (pd.Series): Colonne 'Time' brute.
+
+    Returns:
+        tuple: (index datetime, dates en datetime64, heures normalisées au format hh:mm:ss)
+    """
+    date_codes, unique_dates = pd.factorize(dates)
+    time_codes, unique_times = pd.factorize(times)
+    parsed_dates = pd.to_datetime(unique_dates, format='%d/%m/%Y')
+    parsed_times = pd.to_timedelta(unique_times)
+
+    date_values = _broadcast(parsed_dates.values, date_codes, np.datetime64('NaT'))
+    time_deltas = _broadcast(parsed_times.values, time_codes, np.timedelta64('NaT'))
+    time_strings = _broadcast(
+        (pd.Timestamp(0) + parsed_times).strftime('%H:%M:%S').values.astype(object), time_codes, np.nan)
+
+    index = pd.DatetimeIndex(date_values + time_deltas, name='datetime')
+    return index, date_values, time_strings
+
+
+def plan_dtypes(df, tolerance=5e-4):
+    """
+    Choisit pour chaque colonne le type le plus étroit qui conserve ses valeurs.
+
+    Les minimums et maximums de toutes les colonnes numériques sont calculés en une seule réduction. Un type
+    flottant n'est retenu que si l'erreur d'arrondi maximale sur l'étendue de la colonne (max|x| * eps / 2)
+    reste inférieure à `tolerance` : le float16 n'est donc plus choisi pour 'Voltage' (~240 V) ni pour
+    'Global_active_power'. Les colonnes objet deviennent des catégories, 'Time' celle de `TIME_DTYPE`.
+
+    Args:
+        df (pd.DataFrame): Le DataFrame à analyser.
+        tolerance (float): Erreur absolue maximale tolérée. Par défaut la moitié de la résolution des
+            données brutes (3 décimales).
+
+    Returns:
+        dict: Type cible par colonne (seules les colonnes à convertir sont présentes).
+    """
+    plan = {}
+    numeric = df.select_dtypes(include=['integer', 'floating'])
+    if numeric.shape[1]:
+        ranges = numeric.agg(['min', 'max'])
+        for col, dtype in numeric.dtypes.items():
+            low, high = ranges[col]
+            if np.issubdtype(dtype, np.integer):
+                candidates = [t for t in (np.int8, np.int16, np.int32, np.int64)
+                              if np.iinfo(t).min <= low and high <= np.iinfo(t).max]
+            else:
+                magnitude = np.nan_to_num(max(abs(low), abs(high)))
+                candidates = [t for t in (np.float16, np.float32, np.float64)
+                              if magnitude <= np.finfo(t).max and magnitude * np.finfo(t).eps / 2 <= tolerance]
+            target = np.dtype(candidates[0]) if candidates else dtype
+            if target != dtype:
+                plan[col] = target
+    for col in df.select_dtypes(include=['object']).columns:
+        plan[col] = TIME_DTYPE if col == 'Time' else 'category'
+    return plan
+
+
+def apply_dtype_plan(df, plan):
+    """
+    Applique un plan de types produit par `plan_dtypes`, colonne par colonne.
+    """
+    for col, dtype in plan.items():
+        df[col] = df[col].astype(dtype)
+    return df
 
 
 class DataProcessor:
@@ -14,48 +101,99 @@ class DataProcessor:
 
     Attributs:
         df (pd.DataFrame): Le DataFrame à traiter.
+        dtype_plan (dict): Types choisis par le downcast lors du dernier `process_data`.
+        memory_usage (dict): Taille en octets du DataFrame avant et après le downcast.
     
     """
     def __init__(self, df):
         self.df = df
+        self.dtype_plan = {}
+        self.memory_usage = {}
 
-    def process_data(self, numeric_cols):
-        self.__combine_datetime()
+    def process_data(self, numeric_cols, tolerance=5e-4, dtype_plan=None):
+        """
+        Applique le pipeline complet de prétraitement.
+
+        Args:
+            numeric_cols (list): Colonnes à convertir en valeurs numériques.
+            tolerance (float): Erreur d'arrondi maximale tolérée par le downcast.
+            dtype_plan (dict): Plan de types figé d'un traitement précédent (`dtype_plan`). S'il est fourni,
+                il est appliqué tel quel au lieu d'être recalculé, afin que de nouvelles lignes aient les mêmes
+                types que l'historique.
+
+        Returns:
+            pd.DataFrame: Les données traitées, indexées par datetime.
+        """
+        self.__parse_timestamps()
         self.__convert_numeric(numeric_cols)
-        self.__convert_date()
-        self.__convert_time()
         # self.__extract_date_components()
-        self.__downcast()
-        # ramener la cible à la bonne unité, nécéssaire avant la réalisation de l'EDA et les analyses descriptives
-        self.df['Global_active_power_Wh'] = self.df['Global_active_power']*1000/60
-        # création du other_submetering
-        self.df['other_submetering'] = self.df['Global_active_power_Wh'] - \
-            self.df['Sub_metering_1'] - \
-            self.df['Sub_metering_2'] - self.df['Sub_metering_3']
+        self.__downcast(tolerance, dtype_plan)
+        self.__add_energy_columns()
         return self.df
 
-    def __combine_datetime(self):
-        # Combiner les colonnes 'Date' et 'Time' en une seule colonne datetime
-        self.df['datetime'] = pd.to_datetime(
-            self.df['Date'] + ' ' + self.df['Time'], format='%d/%m/%Y %H:%M:%S')
-        # Définir la colonne 'datetime' comme index
-        self.df = self.df.set_index('datetime')
+    @classmethod
+    def iter_process_file(cls, path, numeric_cols, chunksize=500_000, sep=';'):
+        """
+        Lit le fichier brut par morceaux de `chunksize` lignes et applique le même pipeline à chaque morceau
+        (combinaison date/heure, conversion numérique, conversion en Wh, other_submetering).
+
+        Le pic de mémoire dépend de la taille des morceaux et non de celle du fichier. Les colonnes numériques
+        sont converties en float32 plutôt que réduites morceau par morceau, afin que tous les morceaux aient
+        les mêmes types et puissent être concaténés sans conversion.
+
+        Args:
+            path (str): Chemin du fichier brut (ex. household_power_consumption.txt).
+            numeric_cols (list): Colonnes à convertir en valeurs numériques.
+            chunksize (int): Nombre de lignes lues par morceau.
+            sep (str): Séparateur du fichier.
+
+        Yields:
+            pd.DataFrame: Morceau traité, indexé par datetime.
+        """
+        reader = pd.read_csv(path, sep=sep, chunksize=chunksize, dtype=str)
+        for chunk in reader:
+            processor = cls(chunk)
+            processor.__parse_timestamps()
+            processor.__convert_numeric(numeric_cols)
+            processor.df[numeric_cols] = processor.df[numeric_cols].astype(np.float32)
+            processor.__add_energy_columns()
+            yield processor.df
+
+    @classmethod
+    def process_file(cls, path, numeric_cols, chunksize=500_000, sep=';'):
+        """
+        Traite le fichier brut par morceaux (voir `iter_process_file`) et concatène les morceaux typés.
 
+        Returns:
+            pd.DataFrame: Les données traitées, indexées par datetime.
+        """
+        return pd.concat(cls.iter_process_file(path, numeric_cols, chunksize, sep), copy=False)
+
+    @stage
+    def __parse_timestamps(self):
+        # Analyser 'Date' et 'Time' une seule fois, puis définir la colonne 'datetime' comme index
+        index, dates, times = parse_timestamps(self.df['Date'], self.df['Time'])
+        self.df = self.df.set_axis(index, axis=0, copy=False)
+        self.df['Date'] = dates
+        self.df['Time'] = times
+
+    @stage
     def __convert_numeric(self, cols):
         # Convertir les colonnes souhaitées en valeurs numériques, avec les valeurs non convertibles définies sur NaN.
         # on justifiera plus tard le dropna dans le 4. cleaning
         # self.df = self.df.dropna()
         self.df[cols] = self.df[cols].apply(pd.to_numeric, errors='coerce')
 
-    def __convert_date(self):
-        # Convertir la colonne 'Date' en format datetime
-        self.df['Date'] = pd.to_datetime(self.df['Date'], dayfirst=True)
-
-    def __convert_time(self):
-        # apply the datetime.strptime() method to each element in the column
-        self.df['Time'] = self.df['Time'].apply(
-            lambda x: datetime.strptime(x, "%H:%M:%S").strftime("%H:%M:%S"))
+    @stage
+    def __add_energy_columns(self):
+        # ramener la cible à la bonne unité, nécéssaire avant la réalisation de l'EDA et les analyses descriptives
+        self.df['Global_active_power_Wh'] = self.df['Global_active_power']*1000/60
+        # création du other_submetering
+        self.df['other_submetering'] = self.df['Global_active_power_Wh'] - \
+            self.df['Sub_metering_1'] - \
+            self.df['Sub_metering_2'] - self.df['Sub_metering_3']
 
+    @stage
     def __extract_date_components(self):
         # Extraire les composants jour, mois et année de la colonne 'Date'
 
@@ -63,40 +201,16 @@ class DataProcessor:
                                  month=self.df['Date'].dt.month,
                                  year=self.df['Date'].dt.year)
 
-    def __downcast(self):
+    @stage
+    def __downcast(self, tolerance, dtype_plan=None):
         """
-        Downcast pour économiser de la mémoire
+        Downcast pour économiser de la mémoire, sans dépasser l'erreur d'arrondi `tolerance`.
         """
-        cols = self.df.dtypes.index.tolist()
-        types = self.df.dtypes.values.tolist()
-        for i, t in enumerate(types):
-            # Integer
-            if 'int' in str(t):
-                # Check if minimum and maximum are in the limit of int8
-                if self.df[cols[i]].min() > np.iinfo(np.int8).min and self.df[cols[i]].max() < np.iinfo(np.int8).max:
-                    self.df[cols[i]] = self.df[cols[i]].astype(np.int8)
-                # Check if minimum and maximum are in the limit of int16
-                elif self.df[cols[i]].min() > np.iinfo(np.int16).min and self.df[cols[i]].max() < np.iinfo(np.int16).max:
-                    self.df[cols[i]] = self.df[cols[i]].astype(np.int16)
-                # Check if minimum and maximum are in the limit of int32
-                elif self.df[cols[i]].min() > np.iinfo(np.int32).min and self.df[cols[i]].max() < np.iinfo(np.int32).max:
-                    self.df[cols[i]] = self.df[cols[i]].astype(np.int32)
-                # Choose int64
-                else:
-                    self.df[cols[i]] = self.df[cols[i]].astype(np.int64)
-            # Float
-            elif 'float' in str(t):
-                if self.df[cols[i]].min() > np.finfo(np.float16).min and self.df[cols[i]].max() < np.finfo(np.float16).max:
-                    self.df[cols[i]] = self.df[cols[i]].astype(np.float16)
-                elif self.df[cols[i]].min() > np.finfo(np.float32).min and self.df[cols[i]].max() < np.finfo(np.float32).max:
-                    self.df[cols[i]] = self.df[cols[i]].astype(np.float32)
-                else:
-                    self.df[cols[i]] = self.df[cols[i]].astype(np.float64)
-            # Object
-            elif t == object:
-                if cols[i] == 'date':
-                    self.df[cols[i]] = pd.to_datetime(
-                        self.df[cols[i]], format='%Y-%m-%d')
-                else:
-                    self.df[cols[i]] = self.df[cols[i]].astype('category')
+        memory_before = self.df.memory_usage(deep=True).sum()
+        if dtype_plan is None:
+            dtype_plan = plan_dtypes(self.df, tolerance)
+        self.df = apply_dtype_plan(self.df, dtype_plan)
+        # on fige les types effectifs (catégories comprises) pour pouvoir les réappliquer à de nouvelles lignes
+        self.dtype_plan = {col: self.df[col].dtype for col in dtype_plan}
+        self.memory_usage = {'before': memory_before, 'after': self.df.memory_usage(deep=True).sum()}
         return self.df
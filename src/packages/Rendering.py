@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+
+def minmax_downsample(y, n_out):
+    """
+    Indices of the minimum and maximum of each of `n_out // 2` equal buckets, in order.
+
+    Keeps every peak and trough of the series, which is what a line plot of millions of points shows
+    anyway at screen resolution.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n_buckets = max(n_out // 2, 1)
+    bucket = -(-len(y) // n_buckets)
+    n_buckets = -(-len(y) // bucket)
+    padded = np.full(n_buckets * bucket, np.nan)
+    padded[:len(y)] = y
+    blocks = padded.reshape(n_buckets, bucket)
+    # NaN never wins: all-NaN buckets keep their first point, rendered as a gap
+    low = np.argmin(np.where(np.isnan(blocks), np.inf, blocks), axis=1)
+    high = np.argmax(np.where(np.isnan(blocks), -np.inf, blocks), axis=1)
+    offsets = np.arange(n_buckets) * bucket
+    indices = np.sort(np.concatenate([offsets + low, offsets + high]))
+    return np.unique(indices[indices < len(y)])
+
+
+def lttb_downsample(x, y, n_out):
+    """
+    Indices kept by Largest-Triangle-Three-Buckets, which preserves the visual shape of the series.
+
+    The first and last points are always kept; each bucket in between keeps the point forming the
+    largest triangle with the point kept in the previous bucket and the mean of the next bucket.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n_rows = len(y)
+    if n_out >= n_rows or n_out < 3:
+        return np.arange(n_rows)
+
+    edges = np.linspace(1, n_rows - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n_rows - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n_rows
+        next_x = np.nanmean(x[end:next_end]) if next_end > end else x[-1]
+        next_y = np.nanmean(y[end:next_end]) if next_end > end else y[-1]
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(np.nan_to_num(areas, nan=-1.0)))
+        indices[i + 1] = previous
+    return indices
+
+
+def downsample(series, n_points=2000, method="minmax"):
+    """
+    Shape-preserving downsampling of a Series for plotting.
+
+    Args:
+        series (pd.Series): Series indexed by time.
+        n_points (int): Maximum number of points to keep.
+        method (str): "minmax" (min and max per bucket, vectorized) or "lttb".
+
+    Returns:
+        pd.Series: `series` itself if it is short enough, else the kept points.
+    """
+    if len(series) <= n_points:
+        return series
+    if method == "minmax":
+        indices = minmax_downsample(series.to_numpy(), n_points)
+    elif method == "lttb":
+        x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else series.index.to_numpy()
+        indices = lttb_downsample(x, series.to_numpy(), n_points)
+    else:
+        raise ValueError("Invalid method. Please use 'minmax' or 'lttb'.")
+    return series.iloc[indices]
+
+
+def plot_line(series, n_points=2000, method="minmax", ax=None, **kwargs):
+    """
+    Matplotlib line plot of a downsampled series.
+    """
+    if ax is None:
+        import matplotlib.pyplot as plt
+
+        ax = plt.gca()
+    return ax.plot(downsample(series, n_points, method), **kwargs)
+
+
+def line_figure(series, n_points=2000, method="minmax", title=None):
+    """
+    Plotly line chart of a downsampled series.
+
+    In a notebook with ipywidgets, a FigureWidget is returned and the visible range is downsampled again
+    from the full series on every zoom or pan, so details come back when zooming in. Otherwise a static
+    figure of the downsampled series is returned.
+    """
+    import plotly.graph_objs as go
+
+    shown = downsample(series, n_points, method)
+    trace = go.Scattergl(x=shown.index, y=shown.to_numpy(), mode="lines", name=series.name)
+    try:
+        fig = go.FigureWidget(data=[trace])
+    except ImportError:
+        return go.Figure(data=[trace], layout_title_text=title)
+    fig.update_layout(title_text=title)
+
+    def _on_zoom(layout, x_range):
+        visible = series if x_range is None else series.loc[pd.Timestamp(x_range[0]):pd.Timestamp(x_range[1])]
+        shown = downsample(visible, n_points, method)
+        with fig.batch_update():
+            fig.data[0].x = shown.index
+            fig.data[0].y = shown.to_numpy()
+
+    fig.layout.on_change(_on_zoom, "xaxis.range")
+    return fig
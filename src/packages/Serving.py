@@ -0,0 +1,405 @@
+"""
+Batched scoring of the shipped models.
+
+Each model artifact is unpickled once per process, and concurrent requests are grouped into a single
+vectorized `predict` call by a `MicroBatcher`. The module is also a small command line tool:
+
+    python -m packages.Serving serve --model lgbm --port 8000
+    python -m packages.Serving score --model lgbm --input features.csv --output predictions.csv
+
+`serve` answers `POST /predict` with a JSON body {"rows": [{feature: value, ...}, ...]} (or
+{"instances": [[value, ...], ...]} in the model's feature order) and `GET /stats` with the latency and
+throughput counters.
+
+The ConvLSTM does not score feature rows but windows of the series (see `Datasets.WindowDataset`):
+its "instances" are one (window, features) window or a list of them, and `score` slides the windows
+over the `--column` of the input file.
+"""
+import argparse
+import json
+import pickle
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .Datasets import WindowDataset, to_convlstm
+
+MODEL_DIR = Path(__file__).resolve().parents[2] / "model"
+MODEL_PATHS = {"lgbm": MODEL_DIR / "lgbm" / "best_lgb.pickle",
+               "convlstm": MODEL_DIR / "convlstm" / "convlstm.pkl"}
+
+_load_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _unpickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def load_model(model):
+    """
+    Loads a model artifact once per process: later calls, from any thread, get the same object.
+
+    Args:
+        model (str): "lgbm", "convlstm" or the path of a pickled model.
+    """
+    path = str(Path(MODEL_PATHS.get(model, model)).resolve())
+    # lru_cache alone could unpickle the same artifact twice when threads race on the first call
+    with _load_lock:
+        return _unpickle(path)
+
+
+def feature_names(model):
+    """
+    Names of the features a model expects, in order, or None if the model does not record them.
+    """
+    names = getattr(model, "feature_name_", None)
+    if names is None and hasattr(model, "feature_name"):
+        names = model.feature_name()
+    return list(names) if names is not None else None
+
+
+def window_shape(model):
+    """
+    (window, features) shape of the samples of a Keras ConvLSTM, or None for a model scoring feature rows.
+
+    The input shape of the ConvLSTM is (None, subsequences, 1, steps, features): a window is split into
+    `subsequences` of `steps` rows.
+    """
+    input_shape = getattr(model, "input_shape", None)
+    if input_shape is None:
+        return None
+    _, n_subsequences, _, steps, n_features = input_shape
+    return n_subsequences * steps, n_features
+
+
+def to_matrix(rows, features=None):
+    """
+    Stacks feature rows into a float32 matrix, with columns in the model's feature order.
+
+    Args:
+        rows: A DataFrame (e.g. `FeatureEngineer.create_variables` output), a Series (e.g.
+            `OnlineFeatureEngineer.update` output), a dict, a list of dicts or a 2-D array.
+        features (list): Feature order; required for named rows.
+    """
+    if isinstance(rows, pd.Series):
+        rows = rows.to_frame().T
+    elif isinstance(rows, dict) or (isinstance(rows, list) and rows and isinstance(rows[0], dict)):
+        rows = pd.DataFrame([rows] if isinstance(rows, dict) else rows)
+    if isinstance(rows, pd.DataFrame):
+        if features is not None:
+            missing = set(features) - set(rows.columns)
+            if missing:
+                raise KeyError(f"Missing features: {sorted(missing)}")
+            rows = rows[features]
+        return rows.to_numpy(dtype=np.float32)
+    matrix = np.asarray(rows, dtype=np.float32)
+    return matrix.reshape(1, -1) if matrix.ndim == 1 else matrix
+
+
+def predict(model, matrix):
+    """
+    Vectorized prediction of a (n, n_features) matrix, as a 1-D array of n predictions.
+
+    Keras ConvLSTM models take (n, window, features) windows instead (see `window_shape`), reshaped to
+    their input shape with `Datasets.to_convlstm`.
+    """
+    shape = window_shape(model)
+    if shape is not None:
+        if matrix.ndim != 3 or matrix.shape[1:] != shape:
+            raise ValueError(f"This model scores (samples, {shape[0]}, {shape[1]}) windows of the series, built "
+                             f"with Datasets.WindowDataset, not feature rows of shape {matrix.shape[1:]}.")
+        windows = to_convlstm(matrix, model.input_shape[1])
+        return np.asarray(model.predict(windows, verbose=0)).reshape(len(matrix), -1)[:, 0]
+    return np.asarray(model.predict(matrix)).ravel()
+
+
+class LatencyStats:
+    """
+    Thread-safe request latency and throughput counters.
+
+    Latencies are kept for the last `window` requests, so that the percentiles follow the current load.
+    """
+
+    def __init__(self, window=10_000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._started = time.perf_counter()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+
+    def record_batch(self, latencies, n_rows):
+        with self._lock:
+            self._latencies.extend(latencies)
+            self.requests += len(latencies)
+            self.rows += n_rows
+            self.batches += 1
+
+    def snapshot(self):
+        """
+        Counters, p50/p99 latencies in milliseconds and throughput in rows per second.
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            elapsed = time.perf_counter() - self._started
+            p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (np.nan, np.nan)
+            return {"requests": self.requests, "rows": self.rows, "batches": self.batches,
+                    "mean_batch_rows": self.rows / self.batches if self.batches else 0.0,
+                    "p50_ms": float(p50), "p99_ms": float(p99),
+                    "rows_per_s": self.rows / elapsed if elapsed > 0 else 0.0}
+
+
+class MicroBatcher:
+    """
+    Groups concurrent requests into single vectorized predictions, on a background thread.
+
+    A batch is sent as soon as it holds `max_batch_rows` rows, or `max_wait_ms` after its first request.
+
+    Attributes:
+        model: Model with a `predict` method.
+        features (list): Feature order of the model (read from the model by default).
+        sample_shape (tuple): Shape of one row (or one window for a ConvLSTM) of the requests, if known.
+        stats (LatencyStats): Latency and throughput counters.
+    """
+
+    _STOP = object()
+
+    def __init__(self, model, features=None, max_batch_rows=512, max_wait_ms=2.0):
+        self.model = model
+        self.features = feature_names(model) if features is None else list(features)
+        n_features = len(self.features) if self.features is not None else getattr(model, "n_features_in_", None)
+        self.sample_shape = window_shape(model) or ((n_features,) if n_features is not None else None)
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self.stats = LatencyStats()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="MicroBatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        """
+        Queues feature rows (see `to_matrix`), or windows for a ConvLSTM, and returns a Future of their
+        predictions.
+
+        Raises:
+            ValueError: If the rows do not have the shape the model expects, so that a malformed request
+                is rejected before it is batched with others.
+        """
+        matrix = to_matrix(rows, self.features)
+        if window_shape(self.model) is not None and matrix.ndim == 2:
+            matrix = matrix[np.newaxis]
+        if self.sample_shape is not None and matrix.shape[1:] != self.sample_shape:
+            raise ValueError(f"Expected samples of shape {self.sample_shape}, got {matrix.shape[1:]}.")
+        future = Future()
+        self._queue.put((matrix, future, time.perf_counter()))
+        return future
+
+    def predict(self, rows, timeout=None):
+        return self.submit(rows).result(timeout)
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is self._STOP:
+            return None
+        batch, n_rows = [first], len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_rows < self.max_batch_rows:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                self._queue.put(item)
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch
+
+    def _predict_alone(self, matrix):
+        try:
+            return predict(self.model, matrix)
+        except Exception as error:
+            return error
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            matrices, futures, starts = zip(*batch)
+            ends = np.cumsum([len(matrix) for matrix in matrices])
+            try:
+                parts = np.split(predict(self.model, np.concatenate(matrices)), ends[:-1])
+            except Exception:
+                # one bad request must not fail the others batched with it: score them one by one
+                parts = [self._predict_alone(matrix) for matrix in matrices]
+            for future, part in zip(futures, parts):
+                if isinstance(part, Exception):
+                    future.set_exception(part)
+                else:
+                    future.set_result(part)
+            now = time.perf_counter()
+            self.stats.record_batch([now - start for start in starts], int(ends[-1]))
+
+
+class _PredictionHandler(BaseHTTPRequestHandler):
+    # set by `serve`
+    batcher = None
+    timeout_s = None
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._reply(200, self.batcher.stats.snapshot())
+        else:
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            rows = request["rows"] if "rows" in request else request["instances"]
+            predictions = self.batcher.predict(rows, self.timeout_s)
+        except (KeyError, TypeError, ValueError) as error:
+            self._reply(400, {"error": str(error)})
+            return
+        except FutureTimeoutError:
+            self._reply(504, {"error": f"No prediction after {self.timeout_s} s"})
+            return
+        except Exception as error:
+            # errors of the model itself (LightGBM, TensorFlow...) still get a JSON answer
+            self._reply(500, {"error": f"{type(error).__name__}: {error}"})
+            return
+        self._reply(200, {"predictions": predictions.tolist()})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(model="lgbm", host="127.0.0.1", port=8000, max_batch_rows=512, max_wait_ms=2.0, timeout_s=30.0):
+    """
+    Serves the predictions of `model` over HTTP until interrupted.
+
+    A request without its predictions after `timeout_s` seconds gets a 504 answer.
+    """
+    with MicroBatcher(load_model(model), max_batch_rows=max_batch_rows, max_wait_ms=max_wait_ms) as batcher:
+        handler = type("PredictionHandler", (_PredictionHandler,), {"batcher": batcher, "timeout_s": timeout_s})
+        with ThreadingHTTPServer((host, port), handler) as server:
+            print(f"Serving {model} on http://{host}:{server.server_address[1]} (POST /predict, GET /stats)")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+        print(json.dumps(batcher.stats.snapshot()))
+
+
+def _read_features(path):
+    path = Path(path)
+    if path.suffix == ".feather":
+        return pd.read_feather(path).set_index("datetime")
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path, index_col=0, parse_dates=True)
+
+
+def _score_windows(model, df, column, batch_rows):
+    window, n_features = window_shape(model)
+    if n_features == 1:
+        features = [column]
+    else:
+        features = list(df.select_dtypes(include="number").columns)
+        if len(features) != n_features:
+            raise ValueError(f"The model expects {n_features} features per step, the input has {len(features)}.")
+    dataset = WindowDataset(df, column, features, window=window)
+    predictions = [predict(model, windows) for windows, _ in dataset.batches(batch_rows, shuffle=False)]
+    return np.concatenate(predictions) if predictions else np.empty(0), dataset.target_index
+
+
+def score(model, input_path, output_path=None, batch_rows=65_536, column="Global_active_power_Wh"):
+    """
+    Scores a file of feature rows (csv, feather or parquet, as written from `create_variables`) in batches.
+
+    A ConvLSTM scores instead the windows of `column` (see `Datasets.WindowDataset`) that have no missing
+    value, each prediction being indexed by the timestamp that follows its window.
+
+    Returns:
+        pd.Series: The predictions, indexed like the input rows.
+    """
+    model = load_model(model)
+    df = _read_features(input_path)
+    started = time.perf_counter()
+    if window_shape(model) is not None:
+        predictions, index = _score_windows(model, df, column, batch_rows)
+    else:
+        matrix = to_matrix(df, feature_names(model))
+        predictions = np.concatenate([predict(model, matrix[start:start + batch_rows])
+                                      for start in range(0, len(matrix), batch_rows)])
+        index = df.index
+    elapsed = time.perf_counter() - started
+    print(f"Scored {len(predictions)} rows in {elapsed:.3f} s ({len(predictions) / max(elapsed, 1e-9):.0f} rows/s)")
+    result = pd.Series(predictions, index=index, name="prediction")
+    if output_path is not None:
+        result.to_csv(output_path)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batched scoring of the shipped models.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Serve predictions over HTTP.")
+    serve_parser.add_argument("--model", default="lgbm", help="'lgbm', 'convlstm' or the path of a pickled model")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--max-batch-rows", type=int, default=512)
+    serve_parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    serve_parser.add_argument("--timeout-s", type=float, default=30.0)
+
+    score_parser = subparsers.add_parser("score", help="Score a file of feature rows.")
+    score_parser.add_argument("--model", default="lgbm", help="'lgbm', 'convlstm' or the path of a pickled model")
+    score_parser.add_argument("--input", required=True)
+    score_parser.add_argument("--output")
+    score_parser.add_argument("--batch-rows", type=int, default=65_536)
+    score_parser.add_argument("--column", default="Global_active_power_Wh",
+                              help="series windowed for the ConvLSTM")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        serve(args.model, args.host, args.port, args.max_batch_rows, args.max_wait_ms, args.timeout_s)
+    else:
+        score(args.model, args.input, args.output, args.batch_rows, args.column)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+import pandas as pd
+
+from .Processing import PIPELINE_VERSION, DataProcessor
+
+
+def _write_feather(df, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    # Feather ne stocke pas d'index : l'index datetime est écrit comme une colonne
+    df.reset_index().to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _read_feather(path):
+    # lecture par projection du fichier en mémoire (memory map)
+    from pyarrow import feather
+
+    return feather.read_table(path, memory_map=True).to_pandas().set_index('datetime')
+
+
+class ProcessedCache:
+    """
+    Cache disque des données traitées par `DataProcessor`, au format colonnaire Feather.
+
+    Chaque entrée est identifiée par le hash du fichier source, les colonnes numériques, la tolérance du
+    downcast et la version du pipeline (`PIPELINE_VERSION`). Toute modification du fichier source ou du
+    pipeline change la clé : l'ancienne entrée est alors supprimée et les données sont retraitées.
+
+    Attributs:
+        cache_dir (Path): Répertoire où sont stockées les entrées du cache.
+    """
+
+    def __init__(self, cache_dir='data/cache'):
+        self.cache_dir = Path(cache_dir)
+
+    @staticmethod
+    def file_hash(path, block_size=1 << 20):
+        """
+        Calcule le hash SHA-256 du contenu d'un fichier, lu par blocs.
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def key(self, source_path, numeric_cols, tolerance=5e-4, chunked=False):
+        """
+        Clé de cache pour un fichier source et une configuration du pipeline.
+        """
+        payload = json.dumps({'source': self.file_hash(source_path),
+                              'numeric_cols': list(numeric_cols),
+                              'tolerance': tolerance,
+                              'chunked': chunked,
+                              'pipeline_version': PIPELINE_VERSION})
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def source_id(source_path):
+        """
+        Préfixe des entrées d'un fichier source : son nom et le hash de son chemin absolu, pour que deux
+        fichiers de même nom dans des répertoires différents (un export par foyer) ne s'évincent pas.
+        """
+        path = Path(source_path).resolve()
+        return f"{path.stem}-{hashlib.sha256(str(path).encode()).hexdigest()[:8]}"
+
+    def entry_path(self, source_path, key):
+        return self.cache_dir / f"{self.source_id(source_path)}-{key}.feather"
+
+    def load_or_process(self, source_path, numeric_cols, tolerance=5e-4, chunksize=None, sep=';'):
+        """
+        Charge les données traitées depuis le cache, ou traite le fichier source et remplit le cache.
+
+        Args:
+            source_path (str): Chemin du fichier brut.
+            numeric_cols (list): Colonnes à convertir en valeurs numériques.
+            tolerance (float): Tolérance du downcast (voir `DataProcessor.process_data`).
+            chunksize (int): Si renseigné, le fichier est traité par morceaux (`DataProcessor.process_file`).
+            sep (str): Séparateur du fichier brut.
+
+        Returns:
+            pd.DataFrame: Les données traitées, indexées par datetime.
+        """
+        key = self.key(source_path, numeric_cols, tolerance, chunked=chunksize is not None)
+        path = self.entry_path(source_path, key)
+        if path.exists():
+            return _read_feather(path)
+
+        if chunksize is None:
+            df = DataProcessor(pd.read_csv(source_path, sep=sep, dtype=str)).process_data(numeric_cols, tolerance)
+        else:
+            df = DataProcessor.process_file(source_path, numeric_cols, chunksize, sep)
+        self.invalidate(source_path)
+        _write_feather(df, path)
+        return df
+
+    def invalidate(self, source_path):
+        """
+        Supprime toutes les entrées du cache issues de `source_path`.
+        """
+        for path in self.cache_dir.glob(f"{self.source_id(source_path)}-*.feather"):
+            path.unlink()
+
+
+class ProcessedStore:
+    """
+    Stockage incrémental des données traitées : un répertoire de fichiers Feather (un par ajout).
+
+    Le plan de types du premier traitement est figé à la création du stockage. Les nouvelles lignes brutes
+    passent par le même pipeline avec ce plan, puis sont écrites dans un nouveau fichier : le coût d'un ajout
+    dépend du nombre de nouvelles lignes et non de l'historique.
+
+    Attributs:
+        path (Path): Répertoire du stockage.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    @property
+    def meta(self):
+        with open(self.path / 'meta.json') as f:
+            return json.load(f)
+
+    @property
+    def dtype_plan(self):
+        with open(self.path / 'dtype_plan.pkl', 'rb') as f:
+            return pickle.load(f)
+
+    @property
+    def parts(self):
+        return sorted(self.path.glob('part-*.feather'))
+
+    def create(self, df, numeric_cols, dtype_plan):
+        """
+        Initialise le stockage avec un historique déjà traité.
+
+        Args:
+            df (pd.DataFrame): Données traitées par `DataProcessor.process_data`.
+            numeric_cols (list): Colonnes numériques utilisées pour le traitement.
+            dtype_plan (dict): Plan de types du traitement (`DataProcessor.dtype_plan`).
+
+        Returns:
+            ProcessedStore: Le stockage lui-même.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        for part in self.parts:
+            part.unlink()
+        with open(self.path / 'dtype_plan.pkl', 'wb') as f:
+            pickle.dump(dtype_plan, f)
+        self.__write_part(df, 0, numeric_cols)
+        return self
+
+    def append(self, raw_rows):
+        """
+        Traite de nouvelles lignes brutes avec le plan de types figé et les ajoute au stockage.
+
+        Les lignes antérieures ou égales au dernier horodatage stocké sont ignorées, ce qui permet de
+        renvoyer sans risque un lot déjà ajouté.
+
+        Args:
+            raw_rows (pd.DataFrame): Nouvelles lignes au format brut (colonnes 'Date', 'Time', ...).
+
+        Returns:
+            pd.DataFrame: Les lignes traitées effectivement ajoutées.
+
+        Raises:
+            ValueError: Si le stockage a été créé par une autre version du pipeline (`PIPELINE_VERSION`) : les
+                lignes seraient traitées différemment de l'historique, qu'il faut alors recréer.
+        """
+        meta = self.meta
+        if meta.get('pipeline_version') != PIPELINE_VERSION:
+            raise ValueError(f"Le stockage {self.path} a été créé par la version {meta.get('pipeline_version')} du "
+                             f"pipeline, pas {PIPELINE_VERSION} : recréez-le avec `create`.")
+        new = DataProcessor(raw_rows).process_data(meta['numeric_cols'], dtype_plan=self.dtype_plan)
+        new = new[new.index > pd.Timestamp(meta['last_timestamp'])]
+        if len(new):
+            self.__write_part(new, meta['n_parts'], meta['numeric_cols'])
+        return new
+
+    def load(self):
+        """
+        Charge l'ensemble des données stockées.
+        """
+        return pd.concat([_read_feather(part) for part in self.parts])
+
+    def compact(self):
+        """
+        Regroupe tous les ajouts en un seul fichier.
+        """
+        meta, parts = self.meta, self.parts
+        self.__write_part(self.load(), meta['n_parts'], meta['numeric_cols'])
+        for part in parts:
+            part.unlink()
+
+    def __write_part(self, df, number, numeric_cols):
+        _write_feather(df, self.path / f'part-{number:08d}.feather')
+        meta = {'numeric_cols': list(numeric_cols),
+                'last_timestamp': df.index.max().isoformat(),
+                'n_parts': number + 1,
+                'pipeline_version': PIPELINE_VERSION}
+        with open(self.path / 'meta.json', 'w') as f:
+            json.dump(meta, f)
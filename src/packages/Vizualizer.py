@@ -1,13 +1,13 @@
+import weakref
+from pathlib import Path
+
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import scipy.stats as stats
 import numpy as np
-from statsmodels.graphics.gofplots import ProbPlot
-from statsmodels.graphics.tsaplots import plot_acf, plot_pacf
 import calendar
-from ydata_profiling import ProfileReport
-from statsmodels.tsa.seasonal import seasonal_decompose
+
+from .Decomposition import SEASONAL_PERIODS, decompose
+from .Parallel import map_tasks
+from .Rendering import downsample, plot_line
 
 
 class GeneralPresentator:
@@ -60,6 +60,89 @@ class GeneralPresentator:
         print()
 
 
+class ResampleCache:
+    """
+    Lazily computed sums and counts of a minute-level DataFrame at each granularity, shared by every
+    visualizer built on the same frame.
+
+    Each granularity is computed on first access, and coarser ones are derived from finer ones (daily
+    from hourly, weekly and monthly from daily, quarterly from monthly), so the raw frame is only read
+    once, to build the hourly level. The frame is assumed not to be modified once the cache is built.
+    """
+
+    GRANULARITIES = ['H', 'D', 'W', 'M', '3M']
+    _SOURCES = {'D': 'H', 'W': 'D', 'M': 'D', '3M': 'M'}
+    _caches = {}
+
+    def __init__(self, df):
+        self._df = weakref.ref(df)
+        self._sums = {}
+        self._counts = {}
+
+    @classmethod
+    def for_frame(cls, df):
+        """
+        Returns the cache shared by all users of `df`, creating it on first use.
+        """
+        key = id(df)
+        cache = cls._caches.get(key)
+        if cache is None or cache._df() is not df:
+            cache = cls._caches[key] = cls(df)
+            weakref.finalize(df, cls._caches.pop, key, None)
+        return cache
+
+    def sum(self, granularity):
+        """
+        Sum of each numeric column over each period of `granularity` ('H', 'D', 'W', 'M' or '3M').
+        """
+        self._compute(granularity)
+        return self._sums[granularity]
+
+    def count(self, granularity):
+        """
+        Number of non-missing minutes of each numeric column over each period of `granularity`.
+        """
+        self._compute(granularity)
+        return self._counts[granularity]
+
+    def _compute(self, granularity):
+        if granularity in self._sums:
+            return
+        if granularity == 'H':
+            # the only pass over the raw frame: sums and counts come from the same resampling
+            resampled = self._df().select_dtypes(include='number').resample('H').agg(['sum', 'count'])
+            self._sums['H'] = resampled.xs('sum', axis=1, level=1)
+            self._counts['H'] = resampled.xs('count', axis=1, level=1)
+            return
+        source = self._SOURCES[granularity]
+        self._sums[granularity] = self.sum(source).resample(granularity).sum()
+        self._counts[granularity] = self.count(source).resample(granularity).sum()
+
+
+def _sample_rows(df, max_rows):
+    """
+    Keeps one row every k so that `df` has at most `max_rows` rows, preserving the time order.
+    """
+    if max_rows is None or len(df) <= max_rows:
+        return df
+    return df.iloc[::-(-len(df) // max_rows)]
+
+
+def _write_profile(df, title, stem, minimal, formats):
+    """
+    Profiles `df` and writes the report next to `stem` in each format.
+    """
+    from ydata_profiling import ProfileReport
+
+    profile = ProfileReport(df, title=title, minimal=minimal, progress_bar=False)
+    paths = []
+    for extension in formats:
+        path = Path(stem).with_suffix(f".{extension}")
+        profile.to_file(path, silent=True)
+        paths.append(path)
+    return paths
+
+
 class DataPlotter:
     """
     A class to analyze basic statistics and generate plots for a given DataFrame.
@@ -67,55 +150,83 @@ class DataPlotter:
 
     def __init__(self, df):
         """
-        Initializes the class with the given DataFrame and resamples it.
+        Initializes the class with the given DataFrame; resampling happens on first use.
         """
         self.df = df
         self.granularity_text = ['Hourly', 'Daily', 'Weekly', 'Monthly', 'Quarterly']
-        self._resample()
+        self.resample_cache = ResampleCache.for_frame(df)
 
-    def _resample(self):
+    @property
+    def resampled_dfs(self):
         """
-        Resamples the DataFrame into daily, weekly, monthly, and quarterly groups.
+        The hourly, daily, weekly, monthly and quarterly sums.
         """
-        hourly_df = self.df.resample('H').sum()
-        daily_df = self.df.resample('D').sum()
-        weekly_df = self.df.resample('W').sum()
-        monthly_df = self.df.resample('M').sum()
-        quarter_df = self.df.resample('3M').sum()
-
-        self.resampled_dfs = [hourly_df, daily_df, weekly_df, monthly_df, quarter_df]
+        return [self.resample_cache.sum(granularity) for granularity in ResampleCache.GRANULARITIES]
 
     def _get_granularity_list(self, granularity):
         """
         Returns the list of DataFrames based on the granularity input.
         """
-        granularities = {'all': self.resampled_dfs,
-                         'H': [self.resampled_dfs[0]],
-                         'D': [self.resampled_dfs[1]],
-                         'W': [self.resampled_dfs[2]],
-                         'M': [self.resampled_dfs[3]],
-                         '3M': [self.resampled_dfs[4]]}
-        return granularities[granularity]
-
-    def data_profiling(self, granularity='all'):
+        if granularity == 'all':
+            return self.resampled_dfs
+        if granularity not in ResampleCache.GRANULARITIES:
+            raise KeyError(granularity)
+        return [self.resample_cache.sum(granularity)]
+
+    def data_profiling(self, granularity='all', output_dir=None, minimal=False, max_rows=None,
+                       formats=("html", "json"), n_jobs=None):
         """
         Generates a data profiling report for the specified granularity.
+
+        Without `output_dir`, the reports are rendered as notebook widgets. Otherwise they are computed in
+        a pool of processes, one per granularity, and written to `output_dir` as
+        `profile_<granularity>.<format>` files; 'T' profiles the minute-level frame itself.
+
+        Args:
+            granularity: 'all', 'T' or one of ResampleCache.GRANULARITIES.
+            output_dir: Directory of the HTML/JSON reports.
+            minimal: Use the minimal configuration of ydata_profiling (no correlations, interactions...).
+            max_rows: Longer frames are sampled at a regular stride down to at most `max_rows` rows.
+            formats: Formats of the written reports, among 'html' and 'json'.
+            n_jobs: Number of processes (1 to profile everything in the current process).
+
+        Returns:
+            dict: The written paths by granularity, if `output_dir` is set.
         """
-        granularity_list = self._get_granularity_list(granularity)
+        if granularity == 'T':
+            names, frames = ['T'], [self.df.select_dtypes('number')]
+        else:
+            names = ResampleCache.GRANULARITIES if granularity == 'all' else [granularity]
+            frames = self._get_granularity_list(granularity)
 
-        for df in granularity_list:
-            profile = ProfileReport(df, title="Profiling Report")
-            profile.to_widgets()
+        if output_dir is None:
+            from ydata_profiling import ProfileReport
 
-    def plot_time_series(self, column, granularity='all'):
+            for df in frames:
+                profile = ProfileReport(_sample_rows(df, max_rows), title="Profiling Report", minimal=minimal)
+                profile.to_widgets()
+            return None
+
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        tasks = [(_sample_rows(df, max_rows), f"{name} profiling report", output_dir / f"profile_{name}",
+                  minimal, tuple(formats)) for name, df in zip(names, frames)]
+        paths = map_tasks(_write_profile, tasks, n_jobs)
+        return dict(zip(names, paths))
+
+    def plot_time_series(self, column, granularity='all', n_points=2000):
         """
-        Plots the time series of the given column for the specified granularity.
+        Plots the time series of the given column for the specified granularity, downsampled to at most
+        `n_points` points while keeping its peaks and troughs.
         """
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
         granularity_list = self._get_granularity_list(granularity)
 
         for index, df in enumerate(granularity_list):
             plt.figure(figsize=(15, 5))
-            ax = sns.lineplot(data=df[column])
+            ax = sns.lineplot(data=downsample(df[column], n_points))
             if granularity == "all":
                 ax.set(title=f'{self.granularity_text[index]} values', ylabel="Watts/hour")
             elif granularity == "H":
@@ -133,6 +244,9 @@ class DataPlotter:
         """
         Plots the probability plot for the given column for the specified granularity.
         """
+        import matplotlib.pyplot as plt
+        from statsmodels.graphics.gofplots import ProbPlot
+
         granularity_list = self._get_granularity_list(granularity)
 
         for index, df in enumerate(granularity_list):
@@ -143,6 +257,10 @@ class DataPlotter:
         """
         Plots the histogram of the given column for the specified granularity.
         """
+        import matplotlib.pyplot as plt
+        import scipy.stats as stats
+        import seaborn as sns
+
         granularity_list = self._get_granularity_list(granularity)
         for index, df in enumerate(granularity_list):
             plt.figure(figsize=(15, 5))
@@ -169,42 +287,57 @@ class PatternAnalyzer:
 
     def __init__(self, df):
         """
-        Initializes the class with the given DataFrame and resamples it.
+        Initializes the class with the given DataFrame; averages are computed on first use.
         """
         self.df = df
-        self._average()
+        self.resample_cache = ResampleCache.for_frame(df)
+        self._averages = {}
+        self._decompositions = {}
 
-    def _average(self):
+    @property
+    def averaged_dfs(self):
         """
-        Resamples the DataFrame into daily, weekly, monthly, and yearly groups.
+        The averages by day of month, week of year, month and year.
         """
-        daily_avg_df = self.df.groupby(self.df.index.day).mean()
-        weekly_avg_df = self.df.groupby(self.df.index.week).mean()
-        monthly_avg_df = self.df.groupby(self.df.index.month).mean()
-        yearly_avg_df = self.df.groupby(self.df.index.year).mean()
+        return [self._average(granularity) for granularity in ['D', 'W', 'M', 'Y']]
 
-        self.averaged_dfs = [daily_avg_df,
-                             weekly_avg_df, monthly_avg_df, yearly_avg_df]
+    def _average(self, granularity):
+        """
+        Averages the DataFrame by day of month, week of year, month or year.
+
+        Every key only depends on the date, so the minute-level mean is derived from the shared daily
+        sums and counts: sum of the sums over sum of the counts.
+        """
+        if granularity not in self._averages:
+            daily_sum = self.resample_cache.sum('D')
+            daily_count = self.resample_cache.count('D')
+            keys = {'D': daily_sum.index.day,
+                    'W': daily_sum.index.isocalendar().week.to_numpy().astype(np.int64),
+                    'M': daily_sum.index.month,
+                    'Y': daily_sum.index.year}
+            key = pd.Index(keys[granularity], name=self.df.index.name)
+            self._averages[granularity] = daily_sum.groupby(key).sum() / daily_count.groupby(key).sum()
+        return self._averages[granularity]
 
     def _get_granularity_list(self, granularity):
         """
         Returns the list of DataFrames based on the granularity input.
         """
-        granularities = {'all': self.averaged_dfs,
-                         'W': [self.averaged_dfs[0]],
-                         'W': [self.averaged_dfs[1]],
-                         'M': [self.averaged_dfs[2]],
-                         'Y': [self.averaged_dfs[3]]}
-        return granularities[granularity]
+        if granularity == 'all':
+            return self.averaged_dfs
+        return [self._average(granularity)]
 
     def plot_time_series(self, column, granularity='all'):
         """
         Plots the time series of the given column for the specified granularity.
         """
-        granularity_text = ['Daily', 'Weekly', 'Monthly', 'Quarterly']
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        granularity_text = ['Daily', 'Weekly', 'Monthly', 'Yearly']
         granularity_list = self._get_granularity_list(granularity)
 
-        for df in granularity_list:
+        for index, df in enumerate(granularity_list):
             plt.figure(figsize=(15, 5))
             ax = sns.lineplot(data=df[column])
             if granularity == "all":
@@ -215,30 +348,63 @@ class PatternAnalyzer:
                 ax.set(title=f'Weekly values for {column}', ylabel="Watts/hour")
             elif granularity == "M":
                 ax.set(title=f'Monthly values for {column}', ylabel="Watts/hour")
-            elif granularity == "3M":
-                ax.set(title=f'Quarterly values for {column}', ylabel="Watts/hour")
-
+            elif granularity == "Y":
+                ax.set(title=f'Yearly values for {column}', ylabel="Watts/hour")
 
-    def seasonal_decompositation_additive(self, column, granularity="all"):
-        granularity_text = ['Daily', 'Weekly', 'Monthly', 'Quarterly']
-        granularity_list = self._get_granularity_list(granularity)
+    def _series(self, granularity):
+        """
+        The minute ('T') or hourly mean ('H') series of the numeric columns.
+        """
+        if granularity == 'T':
+            return self.df.select_dtypes(include='number')
+        if granularity == 'H':
+            return self.resample_cache.sum('H') / self.resample_cache.count('H')
+        raise KeyError(granularity)
+
+    def decompose(self, columns=None, granularity='H', periods=None, model='additive', method='ma', robust=False,
+                  n_jobs=None):
+        """
+        Seasonal decomposition of the minute ('T') or hourly ('H') series, computed once per set of arguments.
 
-        for index, df in enumerate(granularity_list):
-            print(f"{granularity_text[index]} Decomposition of {column}")
-            result = seasonal_decompose(
-                df[column], model='additive', period=1)
-            result.plot()
-            plt.show()
-            
-    def seasonal_decompositation_multiplicative(self, column, granularity="all"):
-        granularity_text = ['Daily', 'Weekly', 'Monthly', 'Quarterly']
-        granularity_list = self._get_granularity_list(granularity)
+        By default the periods are the day and the week (1440 and 10080 minutes, 24 and 168 hours). See
+        `Decomposition.decompose` for the other arguments.
 
-        for df in granularity_list:
-            print(f"{granularity_text[index]} Decomposition of {column}")
-            result = seasonal_decompose(
-                df[column], model='multiplicative', period=1)
-            result.plot()
+        Returns:
+            Decomposition: Trend, seasonal components by period and residuals, as arrays.
+        """
+        series = self._series(granularity)
+        columns = tuple(series.columns if columns is None else columns)
+        periods = tuple(SEASONAL_PERIODS[granularity] if periods is None else periods)
+        key = (columns, granularity, periods, model, method, robust)
+        if key not in self._decompositions:
+            self._decompositions[key] = decompose(series, periods, list(columns), model, method, robust, n_jobs)
+        return self._decompositions[key]
+
+    def _plot_decomposition(self, column, granularity, model, periods, robust, n_points=2000):
+        import matplotlib.pyplot as plt
+
+        granularity_text = {'T': 'Minute', 'H': 'Hourly'}
+        for name in (['H', 'T'] if granularity == "all" else [granularity]):
+            result = self.decompose([column], name, periods, model, robust=robust)
+            components = {'observed': self._series(name)[column].to_numpy(), 'trend': result.trend[:, 0]}
+            components.update({f'seasonal ({period})': values[:, 0] for period, values in result.seasonal.items()})
+            components['resid'] = result.resid[:, 0]
+
+            print(f"{granularity_text[name]} {model} decomposition of {column}")
+            fig, axs = plt.subplots(len(components), sharex=True, figsize=(15, 2.5 * len(components)))
+            for ax, (label, values) in zip(axs, components.items()):
+                plot_line(pd.Series(values, index=result.index), n_points, ax=ax)
+                ax.set_ylabel(label)
             plt.show()
 
+    def seasonal_decompositation_additive(self, column, granularity="H", periods=None, robust=False):
+        """
+        Plots the additive decomposition of the minute ('T'), hourly ('H') or both ('all') series of `column`.
+        """
+        self._plot_decomposition(column, granularity, 'additive', periods, robust)
 
+    def seasonal_decompositation_multiplicative(self, column, granularity="H", periods=None, robust=False):
+        """
+        Plots the multiplicative decomposition of the minute ('T'), hourly ('H') or both ('all') series of `column`.
+        """
+        self._plot_decomposition(column, granularity, 'multiplicative', periods, robust)